@@ -1,24 +1,48 @@
 import os
 import re
 import json
+import multiprocessing
+import hashlib
+import signal
 import asyncio
+import contextlib
+import contextvars
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
+from urllib.parse import quote
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher, F
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+)
 from aiogram.filters import CommandStart
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, Update
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
 from aiogram.fsm.storage.memory import MemoryStorage
 
-import gspread
+import aiohttp
+from aiohttp import web
+import httplib2
+import google_auth_httplib2
+from google.auth.transport.requests import Request as GoogleAuthRequest
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials
 
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaInMemoryUpload
+from googleapiclient.errors import HttpError
 
 
 # =====================
@@ -32,6 +56,96 @@ DRIVE_FOLDER_ID = os.getenv("GOOGLE_DRIVE_FOLDER_ID")  # може починат
 SERVICE_ACCOUNT_JSON_B64 = os.getenv("SERVICE_ACCOUNT_JSON_B64")  # base64(service_account.json)
 
 STATUS_CHECK_INTERVAL_SEC = int(os.getenv("STATUS_CHECK_INTERVAL_SEC", "20"))
+# кілька реплік за балансувальником (webhook): watcher вмикаємо лише на одній,
+# інакше кожен статус прийде людині стільки разів, скільки реплік
+STATUS_WATCHER_ENABLED = os.getenv("STATUS_WATCHER_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+
+# режим отримання апдейтів: polling | webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публічна адреса, напр. https://bot.up.railway.app
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("PORT", "8080"))  # Railway сам задає PORT
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "64"))
+WEBHOOK_DRAIN_SEC = int(os.getenv("WEBHOOK_DRAIN_SEC", "25"))
+
+# пул keep-alive зʼєднань до Google API (на весь процес)
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "50"))
+GOOGLE_HTTP_TIMEOUT_SEC = int(os.getenv("GOOGLE_HTTP_TIMEOUT_SEC", "30"))
+# квоти Google на хвилину (Sheets: 60 читань і 60 записів на користувача — сервісний акаунт один)
+SHEETS_READS_PER_MIN = int(os.getenv("SHEETS_READS_PER_MIN", "60"))
+SHEETS_WRITES_PER_MIN = int(os.getenv("SHEETS_WRITES_PER_MIN", "60"))
+DRIVE_REQUESTS_PER_MIN = int(os.getenv("DRIVE_REQUESTS_PER_MIN", "600"))
+GOOGLE_INTERACTIVE_RESERVE = float(os.getenv("GOOGLE_INTERACTIVE_RESERVE", "0.3"))  # частка, яку фон не чіпає
+GOOGLE_QUOTA_RETRIES = int(os.getenv("GOOGLE_QUOTA_RETRIES", "3"))
+
+# окремі обмежені пули потоків для блокуючих викликів (googleapiclient, оновлення токена)
+SHEETS_WORKERS = int(os.getenv("SHEETS_WORKERS", "8"))
+DRIVE_WORKERS = int(os.getenv("DRIVE_WORKERS", "4"))
+GOOGLE_QUEUE_MAX = int(os.getenv("GOOGLE_QUEUE_MAX", "200"))
+# write-behind: заявки пишуться в таблицу пачками (раз на N мс або M рядків)
+SUBMIT_FLUSH_MS = int(os.getenv("SUBMIT_FLUSH_MS", "500"))
+SUBMIT_BATCH_ROWS = int(os.getenv("SUBMIT_BATCH_ROWS", "50"))
+
+# локальна SQLite (WAL): журнал заявок, що ще не дійшли до Google Sheets, та інші локальні дані
+LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH", "bot_data.sqlite3")
+JOURNAL_SYNC_INTERVAL_SEC = int(os.getenv("JOURNAL_SYNC_INTERVAL_SEC", "5"))
+JOURNAL_SYNC_BATCH = int(os.getenv("JOURNAL_SYNC_BATCH", "200"))
+# синхронізовані заявки (персональні дані) тримаємо локально не довше N днів
+JOURNAL_RETENTION_DAYS = float(os.getenv("JOURNAL_RETENTION_DAYS", "7"))
+JOURNAL_PURGE_INTERVAL_SEC = int(os.getenv("JOURNAL_PURGE_INTERVAL_SEC", "3600"))
+
+# розсилка статусів: ліміти Telegram (~30 повідомлень/с загалом, ~1/с на чат)
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "16"))
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "25"))
+TG_PER_CHAT_RATE = float(os.getenv("TG_PER_CHAT_RATE", "1"))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "3"))
+# тимчасові збої доставки повторюємо з експоненційною паузою (не частіше за цикл вотчера)
+NOTIFY_BACKOFF_MAX_SEC = int(os.getenv("NOTIFY_BACKOFF_MAX_SEC", "3600"))
+
+# сховище FSM: memory | sqlite | redis (redis — для кількох реплік, потрібен пакет redis)
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite").strip().lower()
+FSM_REDIS_URL = os.getenv("FSM_REDIS_URL", "")
+FSM_TTL_SEC = int(os.getenv("FSM_TTL_SEC", "259200"))  # 3 доби
+FSM_FLUSH_MS = int(os.getenv("FSM_FLUSH_MS", "200"))
+# покинуті анкети: TTL простою для станів Form, ліміт сесій у памʼяті (LRU)
+FSM_IDLE_TTL_SEC = int(os.getenv("FSM_IDLE_TTL_SEC", "21600"))  # 6 год
+FSM_STATE_TTLS = os.getenv("FSM_STATE_TTLS", "")  # напр. "Form:shoot_date=1800,Form:photo=7200"
+FSM_MAX_SESSIONS = int(os.getenv("FSM_MAX_SESSIONS", "5000"))
+FSM_SWEEP_INTERVAL_SEC = int(os.getenv("FSM_SWEEP_INTERVAL_SEC", "60"))
+
+# фонове завантаження фото: on_photo лише ставить задачу, on_consent чекає результат
+PHOTO_UPLOAD_WORKERS = int(os.getenv("PHOTO_UPLOAD_WORKERS", "4"))
+PHOTO_UPLOAD_QUEUE_MAX = int(os.getenv("PHOTO_UPLOAD_QUEUE_MAX", "100"))
+PHOTO_UPLOAD_WAIT_SEC = int(os.getenv("PHOTO_UPLOAD_WAIT_SEC", "90"))
+PHOTO_JOB_TTL_SEC = int(os.getenv("PHOTO_JOB_TTL_SEC", "3600"))
+# фото йде з Telegram у Drive потоком (resumable upload) шматками по DRIVE_UPLOAD_CHUNK_KB;
+# файли більші за PHOTO_SPOOL_THRESHOLD_MB спершу скачуються у тимчасовий файл на диску
+DRIVE_UPLOAD_CHUNK_KB = int(os.getenv("DRIVE_UPLOAD_CHUNK_KB", "2048"))
+PHOTO_SPOOL_THRESHOLD_MB = int(os.getenv("PHOTO_SPOOL_THRESHOLD_MB", "8"))
+# фото розкладаються у підпапки DRIVE_FOLDER_ID: date | date_time | none (усе в корінь, як раніше)
+DRIVE_SUBFOLDERS = os.getenv("DRIVE_SUBFOLDERS", "date").strip().lower()
+# нормалізація фото перед Drive (окремі процеси): поворот за EXIF, без метаданих, JPEG до PHOTO_MAX_EDGE
+PHOTO_NORMALIZE = os.getenv("PHOTO_NORMALIZE", "1") == "1"
+PHOTO_MAX_EDGE = int(os.getenv("PHOTO_MAX_EDGE", "2048"))
+# з кількох PhotoSize беремо найменший, у якого довша сторона >= PHOTO_MIN_LONG_EDGE (0 — завжди найбільший)
+PHOTO_MIN_LONG_EDGE = int(os.getenv("PHOTO_MIN_LONG_EDGE", "1280"))
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", "85"))
+PHOTO_PROCESS_WORKERS = int(os.getenv("PHOTO_PROCESS_WORKERS", "2"))
+# швидка перевірка фото до завантаження: за метаданими і першими PHOTO_PROBE_KB файлу
+PHOTO_MAX_MB = int(os.getenv("PHOTO_MAX_MB", "20"))  # більше Bot API все одно не віддає
+# ліміт на все скачування з Telegram: при прямому потоці зʼєднання відкрите, поки Drive
+# приймає шматки; за замовчуванням ~16 с на МБ максимального фото (повільний канал)
+PHOTO_DOWNLOAD_TIMEOUT_SEC = int(os.getenv("PHOTO_DOWNLOAD_TIMEOUT_SEC", str(max(PHOTO_MAX_MB * 16, 60))))
+PHOTO_MIN_EDGE = int(os.getenv("PHOTO_MIN_EDGE", "600"))
+PHOTO_MIN_PORTRAIT_RATIO = float(os.getenv("PHOTO_MIN_PORTRAIT_RATIO", "1.0"))  # висота / ширина
+PHOTO_PROBE_KB = int(os.getenv("PHOTO_PROBE_KB", "64"))
+
+METRICS_INTERVAL_SEC = int(os.getenv("METRICS_INTERVAL_SEC", "60"))
+
+# як часто індекс імен звіряється з таблицею (менеджери можуть правити руками)
+NAME_INDEX_RECONCILE_SEC = int(os.getenv("NAME_INDEX_RECONCILE_SEC", "300"))
 
 
 # =====================
@@ -52,6 +166,13 @@ DATES = [
 
 TIMES = ["10:20", "11:00", "11:40", "12:30", "13:20"]
 
+# скільки живе незавершена анкета в кожному стані (решта — FSM_IDLE_TTL_SEC);
+# найчастіше кидають одразу після вибору дати
+FSM_STATE_TTL_DEFAULTS = {
+    "Form:shoot_date": 3600,
+    "Form:shoot_time": 3600,
+}
+
 NAMEPRINT_CONST = "Stanislav Maspanov"
 SHOOTPLACE_CONST = "Ukraine"
 SHOOTSTATE_CONST = "Kyiv"
@@ -80,6 +201,7 @@ HEADER = [
     "Status",
     "NotifiedAt",
     "SubmittedAt",
+    "SubmissionId",
 ]
 
 
@@ -272,67 +394,1184 @@ def service_account_info() -> dict:
         raise RuntimeError(f"SERVICE_ACCOUNT_JSON_B64 decode failed (not valid UTF-8 json). {e}")
     return json.loads(txt)
 
-def sheets_client() -> gspread.Client:
-    scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-    creds = ServiceAccountCredentials.from_service_account_info(service_account_info(), scopes=scopes)
-    return gspread.authorize(creds)
+SHEETS_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive"]
+
+# Реєстр клієнтів Google на весь процес: креденшели створюються один раз і
+# оновлюють токен самі, Sheets — один асинхронний клієнт з пулом keep-alive
+# зʼєднань. httplib2 не потокобезпечний, тому Drive — свій на потік.
+class GoogleClients:
+    def __init__(self, info: dict):
+        self.sheets_creds = ServiceAccountCredentials.from_service_account_info(info, scopes=SHEETS_SCOPES)
+        self.drive_creds = ServiceAccountCredentials.from_service_account_info(info, scopes=DRIVE_SCOPES)
+        self._sheets: "AsyncSheets | None" = None
+        self._drive_uploads: "AsyncDrive | None" = None
+        self._local = threading.local()
+
+    def sheets(self) -> "AsyncSheets":
+        if self._sheets is None:
+            self._sheets = AsyncSheets(self.sheets_creds, sheets_pool)
+        return self._sheets
+
+    def drive_uploads(self) -> "AsyncDrive":
+        if self._drive_uploads is None:
+            self._drive_uploads = AsyncDrive(self.drive_creds, drive_pool)
+        return self._drive_uploads
+
+    def drive(self):
+        drive = getattr(self._local, "drive", None)
+        if drive is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.drive_creds, http=httplib2.Http(timeout=GOOGLE_HTTP_TIMEOUT_SEC)
+            )
+            drive = build("drive", "v3", http=http, cache_discovery=False)
+            self._local.drive = drive
+        return drive
+
+_google_clients: GoogleClients | None = None
+_google_clients_lock = threading.Lock()
+
+def init_google_clients() -> GoogleClients:
+    global _google_clients
+    with _google_clients_lock:
+        if _google_clients is None:
+            _google_clients = GoogleClients(service_account_info())
+        return _google_clients
+
+def sheets_client() -> "AsyncSheets":
+    return init_google_clients().sheets()
 
 def drive_service():
-    scopes = ["https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_service_account_info(service_account_info(), scopes=scopes)
-    return build("drive", "v3", credentials=creds, cache_discovery=False)
+    return init_google_clients().drive()
+
+def drive_uploads() -> "AsyncDrive":
+    return init_google_clients().drive_uploads()
+
+
+# =====================
+# BLOCKING I/O POOLS
+# =====================
+# Усі синхронні виклики Google йдуть сюди, а не в event loop. Пул обмежений:
+# понад max_queue задач корутина чекає слот (backpressure), а не росте черга.
+class BlockingPool:
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._slots = asyncio.Semaphore(max(max_queue, workers))
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.done = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _job(self, enqueued_at: float, fn, args, kwargs):
+        waited = time.monotonic() - enqueued_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.done += 1
+
+    async def run(self, fn, *args, **kwargs):
+        enqueued_at = time.monotonic()
+        async with self._slots:
+            with self._lock:
+                self.queued += 1
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._executor, self._job, enqueued_at, fn, args, kwargs)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            avg_wait = self.wait_total / self.done if self.done else 0.0
+            return {
+                "queued": self.queued,
+                "running": self.running,
+                "done": self.done,
+                "failed": self.failed,
+                "avg_wait_ms": round(avg_wait * 1000, 1),
+                "max_wait_ms": round(self.wait_max * 1000, 1),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+sheets_pool = BlockingPool("sheets", SHEETS_WORKERS, GOOGLE_QUEUE_MAX)
+drive_pool = BlockingPool("drive", DRIVE_WORKERS, GOOGLE_QUEUE_MAX)
+# sqlite-зʼєднання одне, тому і потік для нього один
+local_db_pool = BlockingPool("local_db", 1, GOOGLE_QUEUE_MAX)
+
+async def run_drive(fn, *args, **kwargs):
+    bucket = await google_quota.acquire("drive")
+    try:
+        result = await drive_pool.run(fn, *args, **kwargs)
+    except HttpError as e:
+        if e.resp.status == 429:
+            bucket.throttled(e.resp.get("retry-after"))
+        raise
+    bucket.ok()
+    return result
+
+async def metrics_reporter(storage=None):
+    while True:
+        await asyncio.sleep(METRICS_INTERVAL_SEC)
+        for pool in (sheets_pool, drive_pool, local_db_pool):
+            print(f"pool {pool.name}:", json.dumps(pool.stats()))
+        print("submission writer:", json.dumps(submission_writer.stats()))
+        print("photo uploads:", json.dumps(photo_uploader.stats()))
+        print("upload cache:", json.dumps(upload_cache.stats()))
+        print("google quota:", json.dumps(google_quota.stats()))
+        try:
+            print("submission journal:", json.dumps(await submission_journal.stats()))
+        except Exception as e:
+            print("submission journal stats error:", type(e).__name__, str(e))
+        if isinstance(storage, SQLiteStorage):
+            try:
+                print("fsm sessions:", json.dumps(await storage.stats(), ensure_ascii=False))
+            except Exception as e:
+                print("fsm stats error:", type(e).__name__, str(e))
+
+
+# =====================
+# GOOGLE QUOTA
+# =====================
+# Усі виклики Sheets/Drive проходять через хвилинні квоти: окремо читання,
+# записи Sheets і Drive. Фонові задачі (watcher, синхронізація журналу, прогрів)
+# не беруть останні GOOGLE_INTERACTIVE_RESERVE токенів і пропускають уперед
+# хендлери, що чекають. На 429 корзина пригальмовує і поволі розганяється назад.
+google_priority: contextvars.ContextVar[str] = contextvars.ContextVar("google_priority", default="interactive")
+
+def run_in_background():
+    # викликається на початку фонової задачі; create_task копіює контекст, тож діє лише на неї
+    google_priority.set("background")
+
+class QuotaBucket:
+    def __init__(self, per_min: int):
+        self.base_rate = max(per_min, 1) / 60
+        self.rate = self.base_rate
+        # сплеск не більше чверті хвилинної квоти — інакше легко вибрати дві хвилини за одну
+        self.capacity = max(per_min / 4, 1.0)
+        self.reserve = self.capacity * GOOGLE_INTERACTIVE_RESERVE
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.backoff = 0.0
+        self.waiting_interactive = 0
+        self.granted = {"interactive": 0, "background": 0}
+        self.throttles = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, interactive: bool):
+        if interactive:
+            self.waiting_interactive += 1
+        try:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                floor = 1.0 if interactive else 1.0 + self.reserve
+                if self.tokens >= floor and (interactive or not self.waiting_interactive):
+                    self.tokens -= 1
+                    self.granted["interactive" if interactive else "background"] += 1
+                    return
+                await asyncio.sleep(max(floor - self.tokens, 0.1) / self.rate)
+        finally:
+            if interactive:
+                self.waiting_interactive -= 1
+
+    def throttled(self, retry_after: str | None = None):
+        # Google відповів 429: вдвічі повільніше і пауза (Retry-After або наростаюча)
+        self.throttles += 1
+        self.rate = max(self.rate / 2, self.base_rate / 10)
+        self.backoff = min(self.backoff * 2 or 1.0, 60.0)
+        try:
+            pause = float(retry_after) if retry_after else self.backoff
+        except ValueError:
+            pause = self.backoff
+        self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+        self.tokens = 0
+
+    def ok(self):
+        self.backoff = 0.0
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 20)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_min": round(self.rate * 60, 1),
+            "tokens": round(self.tokens, 1),
+            "waiting_interactive": self.waiting_interactive,
+            "throttles": self.throttles,
+            **self.granted,
+        }
+
+class GoogleQuota:
+    def __init__(self):
+        self.buckets = {
+            "sheets_read": QuotaBucket(SHEETS_READS_PER_MIN),
+            "sheets_write": QuotaBucket(SHEETS_WRITES_PER_MIN),
+            "drive": QuotaBucket(DRIVE_REQUESTS_PER_MIN),
+        }
+
+    async def acquire(self, kind: str) -> QuotaBucket:
+        bucket = self.buckets[kind]
+        await bucket.acquire(google_priority.get() == "interactive")
+        return bucket
+
+    def stats(self) -> dict:
+        return {kind: bucket.stats() for kind, bucket in self.buckets.items()}
+
+google_quota = GoogleQuota()
+
+
+# =====================
+# ASYNC SHEETS CLIENT
+# =====================
+# Мінімальний клієнт Sheets v4 поверх aiohttp (він і так їде разом з aiogram):
+# рівно те, що потрібно боту, без потоків на кожен запит.
+SHEETS_API = "https://sheets.googleapis.com/v4/spreadsheets"
+
+class GoogleApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+def col_letter(col: int) -> str:
+    letters = ""
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+def a1(tab: str, cells: str = "") -> str:
+    quoted = "'" + tab.replace("'", "''") + "'"
+    return f"{quoted}!{cells}" if cells else quoted
+
+# Спільна основа для aiohttp-клієнтів Google: сесія з keep-alive і токен,
+# який оновлюється в пулі потоків (pool) лише коли протух.
+class AsyncGoogleApi:
+    def __init__(self, creds, pool: "BlockingPool"):
+        self._creds = creds
+        self._pool = pool
+        self._auth_request = GoogleAuthRequest()
+        self._token_lock = asyncio.Lock()
+        self._session: aiohttp.ClientSession | None = None
+
+    def _http(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=GOOGLE_HTTP_POOL_SIZE, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=GOOGLE_HTTP_TIMEOUT_SEC),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _token(self, force: bool = False) -> str:
+        if not force and self._creds.valid:
+            return self._creds.token
+        async with self._token_lock:
+            if force or not self._creds.valid:
+                # google-auth підписує JWT синхронно — робимо це в пулі
+                await self._pool.run(self._creds.refresh, self._auth_request)
+        return self._creds.token
+
+    def _quota_kind(self, method: str) -> str:
+        return "drive"
+
+    async def _request(self, method: str, url: str, params: dict | list | None = None, body: dict | None = None) -> dict:
+        kind = self._quota_kind(method)
+        refreshed = False
+        error = GoogleApiError(401, "unauthorized")
+        for _ in range(GOOGLE_QUOTA_RETRIES + 2):
+            bucket = await google_quota.acquire(kind)
+            headers = {"Authorization": f"Bearer {await self._token(force=refreshed)}"}
+            async with self._http().request(method, url, params=params, json=body, headers=headers) as resp:
+                if resp.status == 401 and not refreshed:
+                    refreshed = True
+                    continue
+                if resp.status == 429:
+                    # наступний acquire дочекається паузи корзини
+                    bucket.throttled(resp.headers.get("Retry-After"))
+                    error = GoogleApiError(429, await resp.text())
+                    continue
+                if resp.status >= 400:
+                    raise GoogleApiError(resp.status, await resp.text())
+                bucket.ok()
+                return await resp.json()
+        raise error
+
+class AsyncSheets(AsyncGoogleApi):
+    def _quota_kind(self, method: str) -> str:
+        return "sheets_read" if method == "GET" else "sheets_write"
+
+    def _values_url(self, sheet_id: str, rng: str, suffix: str = "") -> str:
+        return f"{SHEETS_API}/{sheet_id}/values/{quote(rng, safe='')}{suffix}"
+
+    async def list_worksheets(self, sheet_id: str) -> list[dict]:
+        data = await self._request("GET", f"{SHEETS_API}/{sheet_id}", params={"fields": "sheets.properties"})
+        return [s["properties"] for s in data.get("sheets", [])]
+
+    async def batch_update(self, sheet_id: str, requests: list[dict]) -> dict:
+        return await self._request("POST", f"{SHEETS_API}/{sheet_id}:batchUpdate", body={"requests": requests})
+
+    async def add_worksheet(self, sheet_id: str, title: str, rows: int, cols: int) -> dict:
+        data = await self.batch_update(sheet_id, [{
+            "addSheet": {"properties": {"title": title, "gridProperties": {"rowCount": rows, "columnCount": cols}}}
+        }])
+        return data["replies"][0]["addSheet"]["properties"]
+
+    async def resize(self, sheet_id: str, gid: int, rows: int, cols: int):
+        await self.batch_update(sheet_id, [{
+            "updateSheetProperties": {
+                "properties": {"sheetId": gid, "gridProperties": {"rowCount": rows, "columnCount": cols}},
+                "fields": "gridProperties(rowCount,columnCount)",
+            }
+        }])
+
+    async def get_values(self, sheet_id: str, rng: str, major: str = "ROWS") -> list[list[str]]:
+        data = await self._request("GET", self._values_url(sheet_id, rng), params={"majorDimension": major})
+        return data.get("values", [])
+
+    async def batch_get(self, sheet_id: str, ranges: list[str], major: str = "ROWS") -> list[list[list[str]]]:
+        if not ranges:
+            return []
+        params = [("ranges", rng) for rng in ranges] + [("majorDimension", major)]
+        data = await self._request("GET", f"{SHEETS_API}/{sheet_id}/values:batchGet", params=params)
+        return [vr.get("values", []) for vr in data.get("valueRanges", [])]
+
+    async def get_header(self, sheet_id: str, tab: str) -> list[str]:
+        rows = await self.get_values(sheet_id, a1(tab, "1:1"))
+        return rows[0] if rows else []
+
+    async def get_column(self, sheet_id: str, tab: str, col: int) -> list[str]:
+        letter = col_letter(col)
+        cols = await self.get_values(sheet_id, a1(tab, f"{letter}:{letter}"), major="COLUMNS")
+        return cols[0] if cols else []
+
+    async def get_all_values(self, sheet_id: str, tab: str) -> list[list[str]]:
+        return await self.get_values(sheet_id, a1(tab))
+
+    async def append_rows(self, sheet_id: str, tab: str, rows: list[list], value_input_option: str = "RAW") -> dict:
+        return await self._request(
+            "POST",
+            self._values_url(sheet_id, a1(tab, "A1"), ":append"),
+            params={"valueInputOption": value_input_option, "insertDataOption": "INSERT_ROWS"},
+            body={"values": rows},
+        )
+
+    async def update_values(self, sheet_id: str, rng: str, values: list[list], value_input_option: str = "RAW") -> dict:
+        return await self._request(
+            "PUT",
+            self._values_url(sheet_id, rng),
+            params={"valueInputOption": value_input_option},
+            body={"range": rng, "values": values},
+        )
+
+    async def batch_update_values(self, sheet_id: str, data: list[tuple[str, list[list]]], value_input_option: str = "RAW") -> dict:
+        return await self._request(
+            "POST",
+            f"{SHEETS_API}/{sheet_id}/values:batchUpdate",
+            body={
+                "valueInputOption": value_input_option,
+                "data": [{"range": rng, "values": values} for rng, values in data],
+            },
+        )
 
 
 # =====================
 # SHEETS HELPERS
 # =====================
-def ensure_sheet_tab(gc: gspread.Client, sheet_id: str, shoot_date_mmddyyyy: str):
-    sh = gc.open_by_key(sheet_id)
+# Кеш на процес: (sheet_id, tab) -> вкладка + шапка + індекси колонок.
+# Заповнюється один раз і скидається лише коли шапка в таблиці розійшлась із кешем.
+class SheetTab:
+    def __init__(self, sheet_id: str, props: dict, header: list[str]):
+        self.sheet_id = sheet_id
+        self.title = props["title"]
+        self.gid = props.get("sheetId", 0)
+        grid = props.get("gridProperties", {})
+        self.row_count = grid.get("rowCount", 0)
+        self.col_count = grid.get("columnCount", 0)
+        self.header = list(header)
+        self.cols = {name: (i + 1) for i, name in enumerate(self.header)}  # 1-based
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.sheet_id, self.title
+
+    def props(self) -> dict:
+        return {
+            "title": self.title,
+            "sheetId": self.gid,
+            "gridProperties": {"rowCount": self.row_count, "columnCount": self.col_count},
+        }
+
+_tab_cache: dict[tuple[str, str], SheetTab] = {}
+_tab_locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+def cached_tab(sheet_id: str, tab: str) -> SheetTab | None:
+    return _tab_cache.get((sheet_id, tab))
+
+def remember_header(sheet_id: str, props: dict, header: list[str]) -> SheetTab:
+    entry = SheetTab(sheet_id, props, header)
+    _tab_cache[entry.key] = entry
+    return entry
+
+def invalidate_tab(sheet_id: str, tab: str):
+    _tab_cache.pop((sheet_id, tab), None)
+
+async def ensure_sheet_tab(sheet_id: str, shoot_date_mmddyyyy: str) -> SheetTab:
     tab = mmddyyyy_tab_name(shoot_date_mmddyyyy)
+    entry = cached_tab(sheet_id, tab)
+    if entry:
+        return entry
+
+    # одна корутина створює/лагодить вкладку, решта чекають на кеш
+    lock = _tab_locks.setdefault((sheet_id, tab), asyncio.Lock())
+    async with lock:
+        entry = cached_tab(sheet_id, tab)
+        if entry:
+            return entry
+
+        sheets = sheets_client()
+        props = next((p for p in await sheets.list_worksheets(sheet_id) if p["title"] == tab), None)
+        if props is None:
+            props = await sheets.add_worksheet(sheet_id, tab, rows=2000, cols=60)
+            await sheets.append_rows(sheet_id, tab, [HEADER])
+
+        current_header = await sheets.get_header(sheet_id, tab)
+        if not current_header:
+            await sheets.append_rows(sheet_id, tab, [HEADER])
+            current_header = HEADER
+
+        missing = [h for h in HEADER if h not in current_header]
+        if missing:
+            new_header = current_header + missing
+            grid = props.setdefault("gridProperties", {})
+            rows = max(grid.get("rowCount", 0), 2000)
+            cols = max(grid.get("columnCount", 0), len(new_header) + 5)
+            await sheets.resize(sheet_id, props.get("sheetId", 0), rows=rows, cols=cols)
+            grid.update(rowCount=rows, columnCount=cols)
+            await sheets.update_values(sheet_id, a1(tab, "1:1"), [new_header])
+            current_header = new_header
+
+        return remember_header(sheet_id, props, current_header)
+
+# Індекс normalize_name_key(ModelName) на вкладку: вантажиться одним читанням
+# колонки, доповнюється при кожному нашому append і раз на
+# NAME_INDEX_RECONCILE_SEC перечитується з таблиці.
+class NameIndex:
+    def __init__(self, keys: set[str]):
+        self.keys = keys
+        self.loaded_at = time.monotonic()
+
+_name_index: dict[tuple[str, str], NameIndex] = {}
+# імена, додані поки триває читання колонки: знімок таблиці їх може вже не містити
+_name_index_added: dict[tuple[str, str], set[str]] = {}
+
+async def load_name_index(tab: SheetTab) -> NameIndex:
+    added = _name_index_added.setdefault(tab.key, set())
+    try:
+        col_idx = tab.cols.get("ModelName")
+        values = (await sheets_client().get_column(tab.sheet_id, tab.title, col_idx))[1:] if col_idx else []
+        index = NameIndex({normalize_name_key(v) for v in values if v})
+        index.keys |= added
+        # рядки, що ще чекають у журналі / write-behind черзі, в таблиці поки не видно
+        index.keys |= submission_journal.pending_names(tab.key)
+        index.keys |= submission_writer.pending_names(tab.key)
+        _name_index[tab.key] = index
+        return index
+    finally:
+        _name_index_added.pop(tab.key, None)
+
+_name_index_reloads: dict[tuple[str, str], asyncio.Task] = {}
+
+def reload_name_index(tab: SheetTab) -> asyncio.Task:
+    # одне читання колонки на вкладку, скільки б корутин його не чекало
+    task = _name_index_reloads.get(tab.key)
+    if task is None:
+        task = asyncio.create_task(load_name_index(tab))
+        _name_index_reloads[tab.key] = task
+        task.add_done_callback(lambda t, key=tab.key: _name_index_reloads.pop(key, None))
+    return task
+
+async def name_index(tab: SheetTab) -> NameIndex:
+    index = _name_index.get(tab.key)
+    if index is None:
+        return await asyncio.shield(reload_name_index(tab))
+    if time.monotonic() - index.loaded_at > NAME_INDEX_RECONCILE_SEC:
+        # звірка з таблицею — у фоні, користувач не чекає на Google
+        reload_name_index(tab)
+    return index
+
+def remember_name(tab: SheetTab, model_name: str):
+    key = normalize_name_key(model_name)
+    if not key:
+        return
+    index = _name_index.get(tab.key)
+    if index is not None:
+        index.keys.add(key)
+    added = _name_index_added.get(tab.key)
+    if added is not None:
+        added.add(key)
+
+def forget_name(tab: SheetTab, model_name: str):
+    key = normalize_name_key(model_name)
+    index = _name_index.get(tab.key)
+    if index is not None:
+        index.keys.discard(key)
+    added = _name_index_added.get(tab.key)
+    if added is not None:
+        added.discard(key)
+
+async def model_exists_in_tab(tab: SheetTab, model_name: str) -> bool:
+    key = normalize_name_key(model_name)
+    if key in submission_journal.pending_names(tab.key):
+        return True
+    try:
+        index = await name_index(tab)
+    except Exception:
+        return False
+    return key in index.keys
+
+# Прогрів вкладки наперед (вибір дати, старт бота): вкладка, шапка й індекс імен
+# вантажаться, поки людина ще друкує, і on_model_name бере все з кешу.
+_tab_warmups: dict[tuple[str, str], asyncio.Task] = {}
+
+async def warm_tab(sheet_id: str, shoot_date_mmddyyyy: str) -> SheetTab:
+    tab = await ensure_sheet_tab(sheet_id, shoot_date_mmddyyyy)
+    await name_index(tab)
+    return tab
+
+def _warmup_done(key: tuple[str, str], task: asyncio.Task):
+    _tab_warmups.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        e = task.exception()
+        print("tab warm-up error:", key[1], type(e).__name__, str(e))
+
+def prefetch_tab(sheet_id: str, shoot_date_mmddyyyy: str) -> asyncio.Task | None:
+    key = (sheet_id, shoot_date_mmddyyyy)
+    task = _tab_warmups.get(key)
+    if task is not None:
+        return task
+    tab = cached_tab(sheet_id, mmddyyyy_tab_name(shoot_date_mmddyyyy))
+    if tab is not None and tab.key in _name_index:
+        return None
+    task = asyncio.create_task(warm_tab(sheet_id, shoot_date_mmddyyyy))
+    _tab_warmups[key] = task
+    task.add_done_callback(lambda t, key=key: _warmup_done(key, t))
+    return task
+
+# Прогрів усіх DATES при старті: паралельно, поки бот уже приймає апдейти.
+# tabs_ready сигналізує, що кеші заповнені (навіть якщо частина вкладок не вдалась).
+tabs_ready = asyncio.Event()
+
+async def warm_all_tabs():
+    run_in_background()
+    started = time.monotonic()
+    try:
+        sheets = sheets_client()
+        # шапки вже наявних вкладок — одним list і одним batchGet замість запитів на кожну
+        wanted = {mmddyyyy_tab_name(ddmmyyyy_to_mmddyyyy(d)) for d in DATES}
+        existing = [
+            p for p in await sheets.list_worksheets(SHEET_ID)
+            if p["title"] in wanted and not cached_tab(SHEET_ID, p["title"])
+        ]
+        headers = await sheets.batch_get(SHEET_ID, [a1(p["title"], "1:1") for p in existing])
+        for props, rows in zip(existing, headers):
+            if rows and all(h in rows[0] for h in HEADER):
+                remember_header(SHEET_ID, props, rows[0])
+
+        # нові вкладки й неповні шапки дотягує ensure_sheet_tab, індекси імен — разом із ними
+        tasks = [t for d in DATES if (t := prefetch_tab(SHEET_ID, ddmmyyyy_to_mmddyyyy(d)))]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        failed = sum(isinstance(r, BaseException) for r in results)
+        print(f"tabs warm-up: {len(DATES)} dates, {failed} failed, {time.monotonic() - started:.1f}s")
+    except Exception as e:
+        print("tabs warm-up error:", type(e).__name__, str(e))
+    finally:
+        tabs_ready.set()
+
+async def append_rows_by_header(tab: SheetTab, row_dicts: list[dict]):
+    sheets = sheets_client()
+    # рядки кладуться за позиціями колонок, тож перед кожною пачкою звіряємо шапку:
+    # менеджер міг вставити чи переставити колонки (одне читання на flush)
+    live_header = await sheets.get_header(tab.sheet_id, tab.title)
+    if live_header != tab.header:
+        invalidate_tab(*tab.key)
+        if all(k in live_header for row_dict in row_dicts for k in row_dict):
+            tab = remember_header(tab.sheet_id, tab.props(), live_header)
+        else:
+            # колонку видалили — ensure_sheet_tab допише відсутні в шапку
+            tab = await ensure_sheet_tab(tab.sheet_id, tab.title)
+
+    rows = [[row_dict.get(h, "") for h in tab.header] for row_dict in row_dicts]
+    try:
+        await sheets.append_rows(tab.sheet_id, tab.title, rows)
+    except Exception:
+        invalidate_tab(*tab.key)
+        raise
+    for row_dict in row_dicts:
+        remember_name(tab, row_dict.get("ModelName", ""))
+
 
+# =====================
+# SUBMISSION WRITER
+# =====================
+# Write-behind черга заявок: рядки накопичуються по вкладках і йдуть у таблицю
+# одним values.append раз на SUBMIT_FLUSH_MS або по SUBMIT_BATCH_ROWS рядків.
+# submit() повертається лише після того, як пачку записано.
+class SubmissionWriter:
+    def __init__(self, flush_ms: int, batch_rows: int):
+        self.flush_sec = flush_ms / 1000
+        self.batch_rows = max(batch_rows, 1)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending: dict[tuple[str, str], list] = {}
+        self._deadlines: dict[tuple[str, str], float] = {}
+        self._tabs: dict[tuple[str, str], SheetTab] = {}
+        self._inflight: dict[tuple[str, str], list] = {}
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+
+    async def submit(self, tab: SheetTab, row_dict: dict):
+        fut = asyncio.get_running_loop().create_future()
+        # імʼя резервуємо одразу, щоб дубль у тій самій пачці теж ловився
+        remember_name(tab, row_dict.get("ModelName", ""))
+        await self._queue.put((tab, row_dict, fut))
+        await fut
+
+    def pending_names(self, key: tuple[str, str]) -> set[str]:
+        items = self._pending.get(key, []) + self._inflight.get(key, [])
+        return {normalize_name_key(row.get("ModelName", "")) for row, _ in items}
+
+    async def run(self):
+        # рядки сюди приносить журнал — це фонова реплікація, а не відповідь користувачу
+        run_in_background()
+        while True:
+            timeout = None
+            if self._deadlines:
+                timeout = max(min(self._deadlines.values()) - time.monotonic(), 0)
+            try:
+                tab, row_dict, fut = await asyncio.wait_for(self._queue.get(), timeout)
+                self._add(tab, row_dict, fut)
+            except asyncio.TimeoutError:
+                pass
+
+            now = time.monotonic()
+            for key in list(self._pending):
+                if len(self._pending[key]) >= self.batch_rows or self._deadlines[key] <= now:
+                    asyncio.create_task(self._flush(self._tabs.pop(key), self._take(key)))
+
+    def _add(self, tab: SheetTab, row_dict: dict, fut: asyncio.Future):
+        self._tabs[tab.key] = tab
+        self._pending.setdefault(tab.key, []).append((row_dict, fut))
+        self._deadlines.setdefault(tab.key, time.monotonic() + self.flush_sec)
+
+    def _take(self, key: tuple[str, str]) -> list:
+        self._deadlines.pop(key, None)
+        return self._pending.pop(key, [])
+
+    async def _flush(self, tab: SheetTab, items: list):
+        tab = cached_tab(*tab.key) or tab
+        inflight = self._inflight.setdefault(tab.key, [])
+        inflight.extend(items)
+        try:
+            await append_rows_by_header(tab, [row_dict for row_dict, _ in items])
+        except Exception as e:
+            print("submission flush error:", tab.title, len(items), type(e).__name__, str(e))
+            # імʼя знімаємо лише коли Google точно відхилив запис; після таймауту/5xx рядок
+            # міг дійти до таблиці — хай краще зайвий дубль-алерт, ніж пропущений дубль
+            rejected = isinstance(e, GoogleApiError) and 400 <= e.status < 500 and e.status not in (408, 429)
+            for row_dict, fut in items:
+                if rejected:
+                    forget_name(tab, row_dict.get("ModelName", ""))
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            for item in items:
+                inflight.remove(item)
+
+        self.flushed_rows += len(items)
+        self.flushed_batches += 1
+        for _, fut in items:
+            if not fut.done():
+                fut.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() + sum(len(v) for v in self._pending.values()),
+            "flushed_rows": self.flushed_rows,
+            "flushed_batches": self.flushed_batches,
+        }
+
+submission_writer = SubmissionWriter(SUBMIT_FLUSH_MS, SUBMIT_BATCH_ROWS)
+
+
+# =====================
+# SUBMISSION JOURNAL
+# =====================
+# Кожна заявка спершу комітиться в локальну SQLite (WAL) і лише потім фоновий
+# journal_sync_worker переносить її у вкладку дати. SubmissionId — ключ
+# ідемпотентності: якщо результат запису невідомий (таймаут, рестарт), перед
+# повтором перевіряємо, чи рядок уже є в таблиці.
+_local_db: sqlite3.Connection | None = None
+
+def local_db() -> sqlite3.Connection:
+    # одне зʼєднання на процес; викликається лише з local_db_pool
+    global _local_db
+    if _local_db is None:
+        db = sqlite3.connect(LOCAL_DB_PATH, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")
+        _local_db = db
+    return _local_db
+
+class SubmissionJournal:
+    def __init__(self):
+        self._db: sqlite3.Connection | None = None
+        self._pending: dict[tuple[str, str], Counter] = {}
+        self._wakeup = asyncio.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = local_db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS submissions ("
+            " id TEXT PRIMARY KEY,"
+            " sheet_id TEXT NOT NULL,"
+            " shoot_date TEXT NOT NULL,"
+            " tab TEXT NOT NULL,"
+            " row_json TEXT NOT NULL,"
+            " state TEXT NOT NULL DEFAULT 'pending',"  # pending | sending | synced
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " last_error TEXT,"
+            " created_at REAL NOT NULL,"
+            " synced_at REAL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS submissions_state ON submissions(state, created_at)")
+        return db
+
+    async def open(self):
+        self._db = await local_db_pool.run(self._connect)
+        for row in await local_db_pool.run(self._unsynced, None):
+            self._count(row["sheet_id"], row["tab"], row["row"], +1)
+
+    def _count(self, sheet_id: str, tab: str, row_dict: dict, delta: int):
+        counter = self._pending.setdefault((sheet_id, tab), Counter())
+        counter[normalize_name_key(row_dict.get("ModelName", ""))] += delta
+        counter += Counter()  # прибирає нулі
+
+    def pending_names(self, key: tuple[str, str]) -> set[str]:
+        return set(self._pending.get(key, ()))
+
+    def _insert(self, submission_id: str, sheet_id: str, shoot_date: str, tab: str, row_json: str):
+        self._db.execute(
+            "INSERT INTO submissions (id, sheet_id, shoot_date, tab, row_json, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (submission_id, sheet_id, shoot_date, tab, row_json, time.time()),
+        )
+
+    def _unsynced(self, limit: int | None) -> list[dict]:
+        cur = self._db.execute(
+            "SELECT id, sheet_id, shoot_date, tab, row_json, state FROM submissions"
+            " WHERE state != 'synced' ORDER BY created_at LIMIT ?",
+            (limit if limit else -1,),
+        )
+        return [
+            {"id": r[0], "sheet_id": r[1], "shoot_date": r[2], "tab": r[3], "row": json.loads(r[4]), "state": r[5]}
+            for r in cur.fetchall()
+        ]
+
+    def _mark(self, ids: list[str], state: str, error: str | None = None):
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "UPDATE submissions SET state = ?, last_error = ?, attempts = attempts + ?,"
+                " synced_at = CASE WHEN ? = 'synced' THEN ? ELSE synced_at END WHERE id = ?",
+                [(state, error, int(state == "sending"), state, now, i) for i in ids],
+            )
+
+    def _purge(self, before: float) -> int:
+        with self._db:
+            return self._db.execute(
+                "DELETE FROM submissions WHERE state = 'synced' AND synced_at < ?", (before,)
+            ).rowcount
+
+    async def purge(self) -> int:
+        # у таблиці заявка вже є — локальна копія потрібна лише для перевірок найближчим часом
+        return await local_db_pool.run(self._purge, time.time() - JOURNAL_RETENTION_DAYS * 86400)
+
+    def _state_counts(self) -> dict:
+        return dict(self._db.execute("SELECT state, COUNT(*) FROM submissions GROUP BY state").fetchall())
+
+    async def add(self, sheet_id: str, shoot_date_mmddyyyy: str, row_dict: dict) -> str:
+        submission_id = row_dict.get("SubmissionId") or uuid.uuid4().hex
+        row_dict["SubmissionId"] = submission_id
+        tab = mmddyyyy_tab_name(shoot_date_mmddyyyy)
+        row_json = json.dumps(row_dict, ensure_ascii=False)
+        self._count(sheet_id, tab, row_dict, +1)
+        try:
+            await local_db_pool.run(self._insert, submission_id, sheet_id, shoot_date_mmddyyyy, tab, row_json)
+        except Exception:
+            self._count(sheet_id, tab, row_dict, -1)
+            raise
+        self._wakeup.set()
+        return submission_id
+
+    async def stats(self) -> dict:
+        return await local_db_pool.run(self._state_counts)
+
+    async def wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def sync_once(self) -> int:
+        rows = await local_db_pool.run(self._unsynced, JOURNAL_SYNC_BATCH)
+        groups: dict[tuple[str, str], list[dict]] = {}
+        for row in rows:
+            groups.setdefault((row["sheet_id"], row["shoot_date"]), []).append(row)
+
+        results = await asyncio.gather(
+            *(self._sync_tab(sheet_id, shoot_date, group) for (sheet_id, shoot_date), group in groups.items()),
+            return_exceptions=True,
+        )
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            raise failed[0]
+        return len(rows)
+
+    async def _sync_tab(self, sheet_id: str, shoot_date_mmddyyyy: str, rows: list[dict]):
+        tab = await ensure_sheet_tab(sheet_id, shoot_date_mmddyyyy)
+
+        uncertain = [r for r in rows if r["state"] == "sending"]
+        if uncertain:
+            id_col = tab.cols.get("SubmissionId")
+            present = set(await sheets_client().get_column(sheet_id, tab.title, id_col)) if id_col else set()
+            already = [r for r in uncertain if r["id"] in present]
+            if already:
+                await self._synced(already)
+                rows = [r for r in rows if r["id"] not in present]
+        if not rows:
+            return
+
+        await local_db_pool.run(self._mark, [r["id"] for r in rows], "sending")
+        results = await asyncio.gather(
+            *(submission_writer.submit(tab, r["row"]) for r in rows),
+            return_exceptions=True,
+        )
+        ok = [r for r, res in zip(rows, results) if not isinstance(res, Exception)]
+        await self._synced(ok)
+
+        errors = [(r, res) for r, res in zip(rows, results) if isinstance(res, Exception)]
+        if errors:
+            # лишаємо 'sending': наступна спроба спершу перевірить SubmissionId у таблиці
+            err = errors[0][1]
+            await local_db_pool.run(self._mark, [r["id"] for r, _ in errors], "sending", f"{type(err).__name__}: {err}")
+            raise err
+
+    async def _synced(self, rows: list[dict]):
+        if not rows:
+            return
+        await local_db_pool.run(self._mark, [r["id"] for r in rows], "synced")
+        for r in rows:
+            self._count(r["sheet_id"], r["tab"], r["row"], -1)
+
+submission_journal = SubmissionJournal()
+
+async def journal_sync_worker():
+    run_in_background()
+    failures = 0
+    purged_at = 0.0
+    while True:
+        try:
+            await submission_journal.sync_once()
+            failures = 0
+        except Exception as e:
+            failures += 1
+            print("journal sync error:", type(e).__name__, str(e))
+        if time.monotonic() - purged_at > JOURNAL_PURGE_INTERVAL_SEC:
+            purged_at = time.monotonic()
+            try:
+                purged = await submission_journal.purge()
+                if purged:
+                    print("submission journal purged:", purged)
+            except Exception as e:
+                print("journal purge error:", type(e).__name__, str(e))
+        # при збоях Google — експоненційна пауза, але не більше 5 хв
+        delay = min(JOURNAL_SYNC_INTERVAL_SEC * (2 ** min(failures, 6)), 300) if failures else JOURNAL_SYNC_INTERVAL_SEC
+        await submission_journal.wait(delay)
+
+
+# =====================
+# PHOTO NORMALIZATION
+# =====================
+# Декодування/ресайз — CPU, тому в окремих процесах, а не в event loop.
+# Працюємо з файлами на диску: між процесами ходять лише шляхи.
+def normalize_photo(src_path: str, dst_path: str, max_edge: int, quality: int) -> tuple[int, int]:
+    from PIL import Image, ImageOps
     try:
-        ws = sh.worksheet(tab)
-    except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=tab, rows=2000, cols=60)
-        ws.append_row(HEADER)
+        from pillow_heif import register_heif_opener  # HEIC з iPhone (є в requirements.txt)
+        register_heif_opener()
+    except ImportError:
+        pass
 
-    current_header = ws.row_values(1)
-    if not current_header:
-        ws.append_row(HEADER)
-        current_header = HEADER
+    with Image.open(src_path) as src:
+        src.draft("RGB", (max_edge, max_edge))  # JPEG декодується одразу зменшеним
+        im = ImageOps.exif_transpose(src)
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        im.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        # exif не передаємо — метадані (GPS, модель телефону) не зберігаються
+        im.save(dst_path, "JPEG", quality=quality, optimize=True, progressive=True)
+        return im.size
+
+_photo_processes: ProcessPoolExecutor | None = None
+_photo_process_slots = asyncio.Semaphore(max(PHOTO_PROCESS_WORKERS, 1) * 2)
+
+async def run_photo_process(fn, *args):
+    global _photo_processes
+    if _photo_processes is None:
+        # spawn, а не fork: у процесі вже живуть потоки пулів, fork з ними може зависнути
+        _photo_processes = ProcessPoolExecutor(
+            max_workers=max(PHOTO_PROCESS_WORKERS, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    async with _photo_process_slots:
+        return await asyncio.get_running_loop().run_in_executor(_photo_processes, fn, *args)
 
-    missing = [h for h in HEADER if h not in current_header]
-    if missing:
-        new_header = current_header + missing
-        ws.resize(rows=max(ws.row_count, 2000), cols=max(ws.col_count, len(new_header) + 5))
-        ws.update("1:1", [new_header])
+def shutdown_photo_processes():
+    if _photo_processes is not None:
+        _photo_processes.shutdown(wait=False, cancel_futures=True)
 
-    return ws
 
-def header_map(ws) -> dict:
-    hdr = ws.row_values(1)
-    return {name: (i + 1) for i, name in enumerate(hdr)}  # 1-based
+# =====================
+# PHOTO VALIDATION
+# =====================
+# Розмір, формат і орієнтацію дістаємо з перших кілобайтів файлу (Range-запит),
+# щоб відсіяти явно погані фото ще до повного скачування.
+class ImageProbe:
+    def __init__(self, fmt: str, width: int | None = None, height: int | None = None, orientation: int = 1):
+        self.format = fmt
+        self.width = width
+        self.height = height
+        self.orientation = orientation
+
+    def display_size(self) -> tuple[int, int] | None:
+        if not (self.width and self.height):
+            return None
+        # EXIF 5..8 — кадр повернутий на 90°
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def exif_orientation(tiff: bytes) -> int:
+    if len(tiff) < 8 or tiff[:2] not in (b"II", b"MM"):
+        return 1
+    order = "little" if tiff[:2] == b"II" else "big"
+    ifd = int.from_bytes(tiff[4:8], order)
+    if ifd + 2 > len(tiff):
+        return 1
+    for n in range(int.from_bytes(tiff[ifd:ifd + 2], order)):
+        entry = ifd + 2 + n * 12
+        if entry + 12 > len(tiff):
+            break
+        if int.from_bytes(tiff[entry:entry + 2], order) == 0x0112:
+            return int.from_bytes(tiff[entry + 8:entry + 10], order)
+    return 1
+
+def probe_jpeg(head: bytes) -> ImageProbe:
+    probe = ImageProbe("jpeg")
+    i = 2
+    while i + 4 <= len(head):
+        if head[i] != 0xFF:
+            i += 1
+            continue
+        marker = head[i + 1]
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 1 if marker == 0xFF else 2
+            continue
+        seg_len = int.from_bytes(head[i + 2:i + 4], "big")
+        if marker == 0xE1 and head[i + 4:i + 10] == b"Exif\x00\x00":
+            probe.orientation = exif_orientation(head[i + 10:i + 2 + seg_len])
+        elif marker in JPEG_SOF_MARKERS and i + 9 <= len(head):
+            probe.height = int.from_bytes(head[i + 5:i + 7], "big")
+            probe.width = int.from_bytes(head[i + 7:i + 9], "big")
+            break
+        i += 2 + seg_len
+    return probe
+
+def probe_image(head: bytes) -> ImageProbe | None:
+    if head[:2] == b"\xff\xd8":
+        return probe_jpeg(head)
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        return ImageProbe("png", int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big"))
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+        chunk = head[12:16]
+        if chunk == b"VP8X":
+            return ImageProbe("webp", int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1)
+        if chunk == b"VP8 ":
+            return ImageProbe("webp", int.from_bytes(head[26:28], "little") & 0x3FFF, int.from_bytes(head[28:30], "little") & 0x3FFF)
+        if chunk == b"VP8L":
+            bits = int.from_bytes(head[21:25], "little")
+            return ImageProbe("webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+        return ImageProbe("webp")
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1", b"hevc", b"avif"):
+        # HEIF (фото з iPhone): перший ispe зазвичай описує плитку сітки 512×512, а кадр
+        # лежить горизонтально з поворотом в irot — розміри з заголовка не беремо
+        return ImageProbe("heif")
+    return None
+
+async def fetch_file_head(bot: Bot, file_id: str, n_bytes: int) -> bytes:
+    tg_file = await bot.get_file(file_id)
+    if bot.session.api.is_local:
+        local_path = bot.session.api.wrap_local_file.to_local(tg_file.file_path)
+        with open(local_path, "rb") as f:
+            return await asyncio.to_thread(f.read, n_bytes)
+
+    url = bot.session.api.file_url(bot.token, tg_file.file_path)
+    head = bytearray()
+    # якщо сервер проігнорує Range, просто обриваємо потік після n_bytes;
+    # aclosing одразу закриває відповідь і віддає зʼєднання в пул
+    stream = bot.session.stream_content(
+        url=url, headers={"Range": f"bytes=0-{n_bytes - 1}"}, chunk_size=16 * 1024, raise_for_status=True
+    )
+    async with contextlib.aclosing(stream):
+        async for chunk in stream:
+            head += chunk
+            if len(head) >= n_bytes:
+                break
+    return bytes(head[:n_bytes])
+
+def photo_size_problem(width: int | None, height: int | None) -> str | None:
+    if not (width and height):
+        return None
+    if min(width, height) < PHOTO_MIN_EDGE:
+        return (
+            "Фото замале — на ньому важко буде щось роздивитись 🙂\n"
+            "Надішліть, будь ласка, фото кращої якості."
+        )
+    if height < width * PHOTO_MIN_PORTRAIT_RATIO:
+        return "Потрібне саме портретне (вертикальне) фото 📸 Спробуйте, будь ласка, інше."
+    return None
+
+def pick_photo_size(sizes: list, min_long_edge: int):
+    # Telegram дає ті самі фото в кількох розмірах; менший файл — менше байтів на скачування і Drive
+    largest = sizes[-1]
+    if min_long_edge <= 0:
+        return largest
+    fitting = [p for p in sizes if max(p.width, p.height) >= min_long_edge]
+    if not fitting:
+        return largest
+    # file_size порівнюємо лише коли він є в усіх; інакше перший підхожий — Telegram шле від меншого до більшого
+    if all(p.file_size for p in fitting):
+        return min(fitting, key=lambda p: p.file_size)
+    return fitting[0]
+
+async def check_photo(bot: Bot, message: Message) -> str | None:
+    # повертає текст для користувача, якщо фото не підходить
+    if message.photo:
+        best = message.photo[-1]
+        return photo_size_problem(best.width, best.height)
+
+    doc = message.document
+    if doc.file_size and doc.file_size > PHOTO_MAX_MB * 1024 * 1024:
+        return f"Файл завеликий 🙈 Надішліть, будь ласка, фото до {PHOTO_MAX_MB} МБ."
 
-def model_exists_in_tab(ws, model_name: str) -> bool:
     try:
-        hm = header_map(ws)
-        col_idx = hm.get("ModelName")
-        if not col_idx:
-            return False
-        col = ws.col_values(col_idx)
-    except Exception:
-        return False
+        probe = probe_image(await fetch_file_head(bot, doc.file_id, PHOTO_PROBE_KB * 1024))
+    except Exception as e:
+        # перевірка — лише оптимізація, через неї фото не губимо
+        print("photo probe error:", type(e).__name__, str(e))
+        return None
+    if probe is None:
+        return None
+    size = probe.display_size()
+    return photo_size_problem(*size) if size else None
 
-    key = normalize_name_key(model_name)
-    for v in col[1:]:
-        if v and normalize_name_key(v) == key:
-            return True
-    return False
 
-def append_row_by_header(ws, row_dict: dict):
-    hdr = ws.row_values(1)
-    row = [row_dict.get(h, "") for h in hdr]
-    ws.append_row(row, value_input_option="RAW")
+# =====================
+# UPLOAD CACHE
+# =====================
+# Що вже лежить у Drive: file_unique_id Telegram і sha256 вмісту -> посилання.
+# Повторне фото (перевідправка після збою, те саме фото для кількох дітей)
+# не качаємо і не вантажимо вдруге.
+class UploadCache:
+    def __init__(self):
+        self.by_unique_id: dict[str, str] = {}
+        self.by_hash: dict[str, str] = {}
+        self.hits = 0
+
+    def _load(self) -> list[tuple[str, str, str]]:
+        db = local_db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS photo_uploads ("
+            " file_unique_id TEXT PRIMARY KEY,"
+            " sha256 TEXT NOT NULL,"
+            " drive_id TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        return db.execute("SELECT file_unique_id, sha256, url FROM photo_uploads").fetchall()
+
+    def _insert(self, file_unique_id: str, sha256: str, drive_id: str, url: str):
+        local_db().execute(
+            "INSERT OR REPLACE INTO photo_uploads (file_unique_id, sha256, drive_id, url, created_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (file_unique_id, sha256, drive_id, url, time.time()),
+        )
+
+    async def open(self):
+        for file_unique_id, sha256, url in await local_db_pool.run(self._load):
+            self.by_unique_id[file_unique_id] = url
+            self.by_hash[sha256] = url
+
+    def get(self, file_unique_id: str | None) -> str | None:
+        url = self.by_unique_id.get(file_unique_id or "")
+        if url:
+            self.hits += 1
+        return url
+
+    async def get_by_hash(self, file_unique_id: str, sha256: str) -> str | None:
+        # той самий вміст під іншим file_unique_id — запамʼятовуємо і його
+        url = self.by_hash.get(sha256)
+        if url:
+            self.hits += 1
+            await self.add(file_unique_id, sha256, "", url)
+        return url
+
+    async def add(self, file_unique_id: str, sha256: str, drive_id: str, url: str):
+        self.by_unique_id[file_unique_id] = url
+        self.by_hash[sha256] = url
+        await local_db_pool.run(self._insert, file_unique_id, sha256, drive_id, url)
+
+    def stats(self) -> dict:
+        return {"entries": len(self.by_unique_id), "hits": self.hits}
+
+upload_cache = UploadCache()
 
 
 # =====================
@@ -345,95 +1584,772 @@ def normalize_filename(shoot_date_ddmmyyyy: str, shoot_time: str, model_name: st
     safe_date = (shoot_date_ddmmyyyy or "").replace(".", "-")
     return f"{safe_date}_{safe_time}_{safe_name}_{safe_phone}.jpg"
 
-async def upload_photo_to_drive_service_account(bot: Bot, file_id: str, filename: str) -> str:
+def drive_file_version(file_id: str) -> str:
+    # викликається лише з drive_pool; version росте з кожною зміною файлу
+    meta = drive_service().files().get(
+        fileId=file_id,
+        fields="version, modifiedTime",
+        supportsAllDrives=True,
+    ).execute()
+    return f"{meta.get('version', '')}:{meta.get('modifiedTime', '')}"
+
+# Підпапки по даті (і часу) зйомки. Id папок кешуються в памʼяті й у SQLite,
+# тож пошук/створення в Drive — один раз на дату, а не на кожне фото.
+DRIVE_FOLDER_MIME = "application/vnd.google-apps.folder"
+
+def drive_folder_path(shoot_date_ddmmyyyy: str, shoot_time: str) -> tuple[str, ...]:
+    if DRIVE_SUBFOLDERS in ("", "none", "0"):
+        return ()
+    # yyyy-mm-dd — у Drive папки сортуються за датою
+    dd, mm, yyyy = (shoot_date_ddmmyyyy or "").split(".")
+    path = (f"{yyyy}-{mm}-{dd}",)
+    if DRIVE_SUBFOLDERS == "date_time":
+        path += ((shoot_time or "").replace(":", "-"),)
+    return path
+
+def find_or_create_drive_folder(parent_id: str, name: str) -> str:
+    # викликається лише з drive_pool
+    query = (
+        f"'{parent_id}' in parents and name = '{name}'"
+        f" and mimeType = '{DRIVE_FOLDER_MIME}' and trashed = false"
+    )
+    found = drive_service().files().list(
+        q=query,
+        fields="files(id)",
+        pageSize=1,
+        supportsAllDrives=True,
+        includeItemsFromAllDrives=True,
+    ).execute().get("files", [])
+    if found:
+        return found[0]["id"]
+    created = drive_service().files().create(
+        body={"name": name, "mimeType": DRIVE_FOLDER_MIME, "parents": [parent_id]},
+        fields="id",
+        supportsAllDrives=True,
+    ).execute()
+    return created["id"]
+
+class DriveFolders:
+    def __init__(self):
+        self.ids: dict[tuple[str, str], str] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+
+    def _load(self) -> list[tuple[str, str, str]]:
+        db = local_db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS drive_folders ("
+            " parent_id TEXT NOT NULL, name TEXT NOT NULL, folder_id TEXT NOT NULL,"
+            " PRIMARY KEY (parent_id, name))"
+        )
+        return db.execute("SELECT parent_id, name, folder_id FROM drive_folders").fetchall()
+
+    def _insert(self, parent_id: str, name: str, folder_id: str):
+        local_db().execute(
+            "INSERT OR REPLACE INTO drive_folders (parent_id, name, folder_id) VALUES (?, ?, ?)",
+            (parent_id, name, folder_id),
+        )
+
+    def _delete(self, keys: list[tuple[str, str]]):
+        local_db().executemany("DELETE FROM drive_folders WHERE parent_id = ? AND name = ?", keys)
+
+    async def open(self):
+        self.ids = {(parent_id, name): folder_id for parent_id, name, folder_id in await local_db_pool.run(self._load)}
+
+    async def resolve(self, path: tuple[str, ...]) -> str:
+        parent = DRIVE_FOLDER_ID
+        for name in path:
+            key = (parent, name)
+            folder_id = self.ids.get(key)
+            if folder_id is None:
+                # кілька фото на нову дату одночасно — папку створює лише одне
+                async with self._locks.setdefault(key, asyncio.Lock()):
+                    folder_id = self.ids.get(key)
+                    if folder_id is None:
+                        folder_id = await run_drive(find_or_create_drive_folder, parent, name)
+                        self.ids[key] = folder_id
+                        await local_db_pool.run(self._insert, parent, name, folder_id)
+            parent = folder_id
+        return parent
+
+    async def forget(self, path: tuple[str, ...]):
+        # папку видалили в Drive — наступне фото створить її заново
+        keys = []
+        parent = DRIVE_FOLDER_ID
+        for name in path:
+            folder_id = self.ids.pop((parent, name), None)
+            keys.append((parent, name))
+            if folder_id is None:
+                break
+            parent = folder_id
+        if keys:
+            await local_db_pool.run(self._delete, keys)
+
+drive_folders = DriveFolders()
+
+# Resumable upload у Drive: шматки кратні 256 КБ (крім останнього), у памʼяті
+# лише поточний буфер. Після збою питаємо Drive, скільки байтів він уже має,
+# і продовжуємо з того місця.
+DRIVE_UPLOAD_API = "https://www.googleapis.com/upload/drive/v3/files"
+UPLOAD_ALIGN = 256 * 1024
+UPLOAD_RETRIES = 5
+
+class ResumableUpload:
+    def __init__(self, http: aiohttp.ClientSession, url: str):
+        self.http = http
+        self.url = url
+        self.offset = 0  # скільки байтів Drive уже підтвердив
+
+    def _commit(self, buf: bytearray, range_header: str | None):
+        committed = int(range_header.rsplit("-", 1)[1]) + 1 if range_header else 0
+        del buf[:max(committed - self.offset, 0)]
+        self.offset = max(committed, self.offset)
+
+    async def send(self, buf: bytearray, final: bool) -> dict | None:
+        # відправляє буфер (починаючи з self.offset) і викидає з нього підтверджені байти;
+        # повертає метадані файлу, коли Drive зібрав файл повністю
+        for attempt in range(UPLOAD_RETRIES):
+            n = len(buf) if final else len(buf) // UPLOAD_ALIGN * UPLOAD_ALIGN
+            if n == 0 and not final:
+                return None
+            total = str(self.offset + len(buf)) if final else "*"
+            content_range = f"bytes {self.offset}-{self.offset + n - 1}/{total}" if n else f"bytes */{total}"
+            bucket = await google_quota.acquire("drive")
+            try:
+                async with self.http.put(self.url, data=bytes(buf[:n]), headers={"Content-Range": content_range}) as resp:
+                    if resp.status in (200, 201):
+                        bucket.ok()
+                        del buf[:]
+                        self.offset += n
+                        return await resp.json()
+                    if resp.status == 308:
+                        bucket.ok()
+                        self._commit(buf, resp.headers.get("Range"))
+                        if not final:
+                            return None
+                        continue
+                    if resp.status == 429:
+                        bucket.throttled(resp.headers.get("Retry-After"))
+                    elif resp.status < 500:
+                        raise GoogleApiError(resp.status, await resp.text())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print("drive chunk error:", type(e).__name__, str(e))
+
+            await asyncio.sleep(2 ** attempt)
+            done = await self._sync_offset(buf, final)
+            if done is not None:
+                return done
+        raise GoogleApiError(503, "resumable upload did not complete")
+
+    async def _sync_offset(self, buf: bytearray, final: bool) -> dict | None:
+        total = str(self.offset + len(buf)) if final else "*"
+        await google_quota.acquire("drive")
+        try:
+            async with self.http.put(self.url, headers={"Content-Range": f"bytes */{total}"}) as resp:
+                if resp.status in (200, 201):
+                    del buf[:]
+                    return await resp.json()
+                if resp.status == 308:
+                    self._commit(buf, resp.headers.get("Range"))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        return None
+
+class AsyncDrive(AsyncGoogleApi):
+    async def start_resumable(self, metadata: dict, mimetype: str, size: int | None = None) -> ResumableUpload:
+        headers = {
+            "Authorization": f"Bearer {await self._token()}",
+            "X-Upload-Content-Type": mimetype,
+        }
+        if size:
+            headers["X-Upload-Content-Length"] = str(size)
+        params = {"uploadType": "resumable", "supportsAllDrives": "true", "fields": "id,webViewLink"}
+        bucket = await google_quota.acquire("drive")
+        async with self._http().post(DRIVE_UPLOAD_API, params=params, json=metadata, headers=headers) as resp:
+            if resp.status == 429:
+                bucket.throttled(resp.headers.get("Retry-After"))
+            if resp.status >= 400:
+                raise GoogleApiError(resp.status, await resp.text())
+            bucket.ok()
+            return ResumableUpload(self._http(), resp.headers["Location"])
+
+async def telegram_file_chunks(bot: Bot, file_path: str, chunk_size: int):
+    if bot.session.api.is_local:
+        # локальний Bot API server віддає шлях до файлу на диску
+        local_path = bot.session.api.wrap_local_file.to_local(file_path)
+        with open(local_path, "rb") as f:
+            async for chunk in file_chunks(f, chunk_size):
+                yield chunk
+        return
+    url = bot.session.api.file_url(bot.token, file_path)
+    async for chunk in bot.session.stream_content(
+        url=url, timeout=PHOTO_DOWNLOAD_TIMEOUT_SEC, chunk_size=chunk_size, raise_for_status=True
+    ):
+        yield chunk
+
+async def file_chunks(f, chunk_size: int):
+    while chunk := await asyncio.to_thread(f.read, chunk_size):
+        yield chunk
+
+async def hashed_chunks(chunks, digest):
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+async def stream_to_drive(chunks, metadata: dict, mimetype: str, size: int | None) -> dict:
+    upload = await drive_uploads().start_resumable(metadata, mimetype, size)
+    chunk_bytes = max(DRIVE_UPLOAD_CHUNK_KB * 1024 // UPLOAD_ALIGN, 1) * UPLOAD_ALIGN
+    buf = bytearray()
+    async for chunk in chunks:
+        buf += chunk
+        if len(buf) >= chunk_bytes:
+            await upload.send(buf, final=False)
+    created = None
+    while created is None:
+        created = await upload.send(buf, final=True)
+    return created
+
+async def download_to(f, bot: Bot, file_path: str, digest):
+    async for chunk in hashed_chunks(telegram_file_chunks(bot, file_path, 256 * 1024), digest):
+        await asyncio.to_thread(f.write, chunk)
+
+async def upload_normalized_photo(bot: Bot, file_path: str, metadata: dict, file_unique_id: str, digest) -> dict | str:
+    # повертає метадані нового файлу або посилання з кешу, якщо такий вміст уже в Drive
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "src")
+        dst = os.path.join(tmp, "dst.jpg")
+        with open(src, "wb") as f:
+            await download_to(f, bot, file_path, digest)
+        cached = await upload_cache.get_by_hash(file_unique_id, digest.hexdigest())
+        if cached:
+            return cached
+
+        path = dst
+        try:
+            await run_photo_process(normalize_photo, src, dst, PHOTO_MAX_EDGE, PHOTO_JPEG_QUALITY)
+        except Exception as e:
+            # не змогли декодувати — вантажимо оригінал, менеджер розбереться
+            print("photo normalize error:", type(e).__name__, str(e))
+            path = src
+
+        with open(path, "rb") as f:
+            return await stream_to_drive(file_chunks(f, 256 * 1024), metadata, "image/jpeg", os.path.getsize(path))
+
+async def upload_photo_to_drive_service_account(bot: Bot, file_id: str, filename: str, folder: tuple[str, ...] = ()) -> str:
     if not DRIVE_FOLDER_ID:
         raise RuntimeError("GOOGLE_DRIVE_FOLDER_ID is empty in Railway Variables")
 
-    drive = drive_service()
-
     tg_file = await bot.get_file(file_id)
-    file_bytes = await bot.download_file(tg_file.file_path)
-    data = file_bytes.read()
+    cached = upload_cache.get(tg_file.file_unique_id)
+    if cached:
+        return cached
 
-    media = MediaInMemoryUpload(data, mimetype="image/jpeg", resumable=False)
-    metadata = {"name": filename, "parents": [DRIVE_FOLDER_ID]}
-
-    created = drive.files().create(
-        body=metadata,
-        media_body=media,
-        fields="id, webViewLink",
-        supportsAllDrives=True,
-    ).execute()
+    try:
+        return await upload_new_photo(bot, tg_file, filename, await drive_folders.resolve(folder))
+    except (GoogleApiError, HttpError) as e:
+        # upload (aiohttp) дає GoogleApiError, створення підпапки (googleapiclient) — HttpError
+        status = e.status if isinstance(e, GoogleApiError) else e.resp.status
+        if status == 404 and folder:
+            await drive_folders.forget(folder)
+        raise
+
+async def upload_new_photo(bot: Bot, tg_file, filename: str, parent_id: str) -> str:
+    size = tg_file.file_size
+    metadata = {"name": filename, "parents": [parent_id]}
+    digest = hashlib.sha256()  # хеш оригіналу з Telegram
+
+    if PHOTO_NORMALIZE:
+        created = await upload_normalized_photo(bot, tg_file.file_path, metadata, tg_file.file_unique_id, digest)
+        if isinstance(created, str):
+            return created
+    elif size and size > PHOTO_SPOOL_THRESHOLD_MB * 1024 * 1024:
+        # великий файл: спершу на диск, щоб не тримати зʼєднання з Telegram, поки Drive приймає шматки
+        with tempfile.TemporaryFile() as spool:
+            await download_to(spool, bot, tg_file.file_path, digest)
+            cached = await upload_cache.get_by_hash(tg_file.file_unique_id, digest.hexdigest())
+            if cached:
+                return cached
+            await asyncio.to_thread(spool.seek, 0)
+            created = await stream_to_drive(file_chunks(spool, 256 * 1024), metadata, "image/jpeg", size)
+    else:
+        # потоком без диска: хеш відомий лише в кінці, тож він лише поповнює кеш
+        created = await stream_to_drive(
+            hashed_chunks(telegram_file_chunks(bot, tg_file.file_path, 64 * 1024), digest), metadata, "image/jpeg", size
+        )
 
-    return created.get("webViewLink") or f"https://drive.google.com/file/d/{created['id']}/view"
+    url = created.get("webViewLink") or f"https://drive.google.com/file/d/{created['id']}/view"
+    await upload_cache.add(tg_file.file_unique_id, digest.hexdigest(), created["id"], url)
+    return url
 
 
 # =====================
-# STATUS WATCHER
+# NOTIFICATIONS
 # =====================
-async def status_watcher(bot: Bot):
-    await asyncio.sleep(3)
-
-    while True:
-        try:
-            gc = sheets_client()
-            sh = gc.open_by_key(SHEET_ID)
-
-            for ws in sh.worksheets():
-                hdr = ws.row_values(1)
-                if not hdr:
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
                     continue
-                if "Status" not in hdr or "TelegramChatId" not in hdr or "NotifiedAt" not in hdr:
-                    continue
-
-                hm = header_map(ws)
-                status_col = hm.get("Status")
-                notified_col = hm.get("NotifiedAt")
-                chat_col = hm.get("TelegramChatId")
-                date_col = hm.get("ShootDate")
-                time_col = hm.get("ShootTime")
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+# Користувач заблокував бота / видалив чат — повторювати марно.
+PERMANENT_SEND_ERRORS = ("chat not found", "user not found", "peer_id_invalid", "user is deactivated", "bot was blocked")
+
+def is_permanent_send_error(e: Exception) -> bool:
+    if isinstance(e, (TelegramForbiddenError, TelegramNotFound, ValueError)):
+        return True
+    if isinstance(e, TelegramBadRequest):
+        msg = (getattr(e, "message", "") or str(e)).lower()
+        return any(p in msg for p in PERMANENT_SEND_ERRORS)
+    return False
 
-                if not (status_col and notified_col and chat_col):
-                    continue
+def undeliverable_marker(reason: str) -> str:
+    # окрема позначка в NotifiedAt, щоб менеджер бачив, що повідомлення не дійшло
+    return f"undeliverable: {reason} {now_iso()}"
 
-                all_rows = ws.get_all_values()
+# Чати, куди доставка неможлива; зберігаються в локальній SQLite між рестартами.
+class ChatBlocklist:
+    def __init__(self):
+        self.chats: dict[str, str] = {}
 
-                for r_i in range(2, len(all_rows) + 1):  # 1-based row index
-                    row = all_rows[r_i - 1]
+    def _load(self) -> list[tuple[str, str]]:
+        db = local_db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS undeliverable_chats ("
+            " chat_id TEXT PRIMARY KEY, reason TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        return db.execute("SELECT chat_id, reason FROM undeliverable_chats").fetchall()
 
-                    def get_by_col(col_num: int) -> str:
-                        return row[col_num - 1] if col_num - 1 < len(row) else ""
+    def _insert(self, chat_id: str, reason: str):
+        local_db().execute(
+            "INSERT OR REPLACE INTO undeliverable_chats (chat_id, reason, created_at) VALUES (?, ?, ?)",
+            (chat_id, reason, time.time()),
+        )
 
-                    status = safe_lower(get_by_col(status_col))
-                    notified = (get_by_col(notified_col) or "").strip()
-                    chat_id = (get_by_col(chat_col) or "").strip()
+    def _delete(self, chat_id: str):
+        local_db().execute("DELETE FROM undeliverable_chats WHERE chat_id = ?", (chat_id,))
+
+    async def open(self):
+        self.chats = dict(await local_db_pool.run(self._load))
+
+    def __contains__(self, chat_id: str) -> bool:
+        return chat_id in self.chats
+
+    async def add(self, chat_id: str, reason: str):
+        self.chats[chat_id] = reason
+        await local_db_pool.run(self._insert, chat_id, reason)
+
+    async def discard(self, chat_id: str):
+        # користувач знову пише боту — чат живий
+        if self.chats.pop(chat_id, None) is not None:
+            await local_db_pool.run(self._delete, chat_id)
+
+chat_blocklist = ChatBlocklist()
+
+class NotifyJob:
+    def __init__(self, tab_key: tuple[str, str], r_i: int, chat_id: str, text: str):
+        self.tab_key = tab_key
+        self.r_i = r_i
+        self.chat_id = chat_id
+        self.text = text
+        self.sent_at: str | None = None
+        self.error: Exception | None = None
+
+    @property
+    def permanent(self) -> bool:
+        return self.error is not None and is_permanent_send_error(self.error)
+
+# Розсилка пулом воркерів: кожне повідомлення бере токен із загального bucket
+# і з bucket свого чату; TelegramRetryAfter ставить на паузу весь потік.
+class Notifier:
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.global_bucket = TokenBucket(TG_GLOBAL_RATE)
+        self.chat_buckets: dict[str, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(TG_PER_CHAT_RATE, capacity=1)
+        return bucket
+
+    async def _send(self, job: NotifyJob):
+        for attempt in range(NOTIFY_MAX_RETRIES + 1):
+            await self._chat_bucket(job.chat_id).acquire()
+            await self.global_bucket.acquire()
+            try:
+                await self.bot.send_message(int(job.chat_id), job.text, parse_mode="Markdown")
+                job.sent_at = now_iso()
+                job.error = None
+                return
+            except TelegramRetryAfter as e:
+                job.error = e
+                self.global_bucket.pause(e.retry_after)
+            except Exception as e:
+                job.error = e
+                return
+
+    async def send_all(self, jobs: list[NotifyJob]) -> dict:
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        async def worker():
+            while True:
+                try:
+                    job = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self._send(job)
+
+        await asyncio.gather(*(worker() for _ in range(min(NOTIFY_WORKERS, len(jobs)))))
+        # bucket-и чатів потрібні лише в межах циклу
+        self.chat_buckets.clear()
+
+        sent = sum(1 for j in jobs if j.sent_at)
+        permanent = sum(1 for j in jobs if j.permanent)
+        return {"sent": sent, "failed": len(jobs) - sent, "undeliverable": permanent}
 
-                    if not chat_id:
-                        continue
-                    if notified:
-                        continue
-                    if status not in {"approved", "rejected"}:
-                        continue
 
-                    shoot_date = (get_by_col(date_col) or "").strip() if date_col else ""
-                    shoot_time = (get_by_col(time_col) or "").strip() if time_col else ""
+# =====================
+# PHOTO UPLOADS
+# =====================
+# Обмежений пул воркерів, що качає фото з Telegram і вантажить у Drive у фоні.
+# Результат — future за job_id; job_id + file_id лежать у FSM, тож після
+# рестарту on_consent просто поставить задачу заново.
+class PhotoUploader:
+    def __init__(self, workers: int, queue_max: int):
+        self.workers = max(workers, 1)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(queue_max, 1))
+        self._jobs: dict[str, asyncio.Future] = {}
+        self._tasks: list[asyncio.Task] = []
+        self.done = 0
+        self.failed = 0
+
+    def start(self, bot: Bot):
+        self._tasks = [asyncio.create_task(self._worker(bot)) for _ in range(self.workers)]
+
+    async def enqueue(self, file_id: str, filename: str, folder: tuple[str, ...] = ()) -> str:
+        job_id = uuid.uuid4().hex
+        fut = asyncio.get_running_loop().create_future()
+        fut.add_done_callback(lambda f, job_id=job_id: self._finished(job_id, f))
+        self._jobs[job_id] = fut
+        await self._queue.put((file_id, filename, folder, fut))
+        return job_id
+
+    def _finished(self, job_id: str, fut: asyncio.Future):
+        if not fut.cancelled() and fut.exception() is None:
+            self.done += 1
+        else:
+            self.failed += 1
+        # результат тримаємо, поки користувач дійде до згоди, але не вічно
+        asyncio.get_running_loop().call_later(PHOTO_JOB_TTL_SEC, self._jobs.pop, job_id, None)
+
+    def is_done(self, job_id: str | None) -> bool:
+        fut = self._jobs.get(job_id or "")
+        return fut is not None and fut.done()
+
+    async def result(self, job_id: str | None, timeout: float) -> str | None:
+        fut = self._jobs.get(job_id or "")
+        if fut is None:
+            return None
+        return await asyncio.wait_for(asyncio.shield(fut), timeout)
+
+    async def _worker(self, bot: Bot):
+        while True:
+            file_id, filename, folder, fut = await self._queue.get()
+            try:
+                url = await upload_photo_to_drive_service_account(bot, file_id, filename, folder)
+                if not fut.done():
+                    fut.set_result(url)
+            except Exception as e:
+                print("upload error:", type(e).__name__, str(e))
+                if not fut.done():
+                    fut.set_exception(e)
+
+    def stats(self) -> dict:
+        return {"queued": self._queue.qsize(), "jobs": len(self._jobs), "done": self.done, "failed": self.failed}
+
+photo_uploader = PhotoUploader(PHOTO_UPLOAD_WORKERS, PHOTO_UPLOAD_QUEUE_MAX)
 
-                    if status == "approved":
-                        text = APPROVED_TEXT.format(shoot_date=shoot_date, shoot_time=shoot_time)
-                        if shoot_date in LOCATION_DATES_MMDDYYYY:
-                            text += APPROVED_LOCATION_10_11
-                    else:
-                        text = REJECTED_TEXT
 
-                    try:
-                        await bot.send_message(int(chat_id), text, parse_mode="Markdown")
-                    except Exception:
-                        continue
+# =====================
+# STATUS WATCHER
+# =====================
+# Вотчер читає не всю таблицю, а лише потрібні колонки всіх вкладок одним
+# values.batchGet. Кожна колонка читається разом із клітинкою шапки: якщо
+# там не та назва — менеджер зсунув колонки, кеш шапки вкладки скидається.
+WATCH_REQUIRED = ("Status", "TelegramChatId", "NotifiedAt")
+WATCH_COLUMNS = WATCH_REQUIRED + ("ShootDate", "ShootTime")
+
+def is_watched(tab: SheetTab | None) -> bool:
+    return tab is not None and all(c in tab.cols for c in WATCH_REQUIRED)
+
+async def load_watch_tabs(sheets: AsyncSheets) -> list[SheetTab]:
+    all_props = await sheets.list_worksheets(SHEET_ID)
+
+    # шапки дочитуємо лише для нових вкладок і тих, де потрібних колонок ще нема
+    unknown = [p for p in all_props if not is_watched(cached_tab(SHEET_ID, p["title"]))]
+    headers = await sheets.batch_get(SHEET_ID, [a1(p["title"], "1:1") for p in unknown])
+    for props, rows in zip(unknown, headers):
+        if rows and rows[0]:
+            remember_header(SHEET_ID, props, rows[0])
+
+    tabs = [cached_tab(SHEET_ID, p["title"]) for p in all_props]
+    return [t for t in tabs if is_watched(t)]
+
+async def fetch_watch_columns(
+    sheets: AsyncSheets, tabs: list[SheetTab], names: tuple[str, ...] = WATCH_COLUMNS
+) -> dict[tuple[str, str], dict[str, list[str]]]:
+    ranges, slots = [], []
+    for tab in tabs:
+        for name in names:
+            col = tab.cols.get(name)
+            if col:
+                letter = col_letter(col)
+                ranges.append(a1(tab.title, f"{letter}1:{letter}"))
+                slots.append((tab, name))
+
+    columns: dict[tuple[str, str], dict[str, list[str]]] = {}
+    stale = set()
+    for (tab, name), values in zip(slots, await sheets.batch_get(SHEET_ID, ranges, major="COLUMNS")):
+        col = values[0] if values else []
+        if not col or col[0] != name:
+            stale.add(tab.key)
+            continue
+        columns.setdefault(tab.key, {})[name] = col
+
+    for key in stale:
+        invalidate_tab(*key)
+        columns.pop(key, None)
+    return columns
+
+# Перевірка змін перед скануванням: спершу version файлу з Drive (якщо таблицю
+# ніхто не чіпав — цикл пропускаємо повністю), потім відбиток Status+NotifiedAt
+# кожної вкладки — решту колонок читаємо лише там, де відбиток змінився.
+FINGERPRINT_COLUMNS = ("Status", "NotifiedAt")
+
+class WatchState:
+    def __init__(self):
+        self.version: str | None = None
+        self.fingerprints: dict[tuple[str, str], str] = {}
+        # вкладка -> коли її треба пересканувати навіть без змін (є недоставлене / незаписане)
+        self.pending: dict[tuple[str, str], float] = {}
+        # (вкладка, рядок) -> (chat_id, час): повідомлення надіслане, а NotifiedAt не записався
+        self.unstamped: dict[tuple[tuple[str, str], int], tuple[str, str]] = {}
+        # (вкладка, рядок) -> (chat_id, спроби, коли можна повторити) для тимчасових збоїв
+        self.retry: dict[tuple[tuple[str, str], int], tuple[str, int, float]] = {}
+
+    def mark_pending(self, tab_key: tuple[str, str], at: float = 0.0):
+        self.pending[tab_key] = min(self.pending.get(tab_key, at), at)
+
+    def is_due(self, tab_key: tuple[str, str]) -> bool:
+        return self.pending.get(tab_key, float("inf")) <= time.monotonic()
+
+    def any_due(self) -> bool:
+        return any(self.is_due(k) for k in self.pending)
+
+    def schedule_retry(self, tab_key: tuple[str, str], r_i: int, chat_id: str):
+        prev = self.retry.get((tab_key, r_i))
+        attempts = prev[1] + 1 if prev and prev[0] == chat_id else 1
+        delay = min(STATUS_CHECK_INTERVAL_SEC * (2 ** min(attempts - 1, 16)), NOTIFY_BACKOFF_MAX_SEC)
+        at = time.monotonic() + delay
+        self.retry[(tab_key, r_i)] = (chat_id, attempts, at)
+        self.mark_pending(tab_key, at)
+
+watch_state = WatchState()
+
+def column_fingerprint(cols: dict[str, list[str]]) -> str:
+    h = hashlib.sha1()
+    for name in FINGERPRINT_COLUMNS:
+        h.update(name.encode("utf-8"))
+        for v in cols.get(name, []):
+            h.update(b"\x1f" + v.encode("utf-8"))
+    return h.hexdigest()
+
+async def sheet_version() -> str | None:
+    try:
+        return await run_drive(drive_file_version, SHEET_ID)
+    except Exception as e:
+        # без Drive просто скануємо як раніше
+        print("sheet version check error:", type(e).__name__, str(e))
+        return None
+
+async def changed_watch_columns(sheets: AsyncSheets, version: str | None) -> dict[tuple[str, str], dict[str, list[str]]]:
+    if version is not None and version == watch_state.version and not watch_state.any_due():
+        return {}
+
+    tabs = await load_watch_tabs(sheets)
+    fingerprint_cols = await fetch_watch_columns(sheets, tabs, FINGERPRINT_COLUMNS)
+
+    changed = []
+    for tab in tabs:
+        cols = fingerprint_cols.get(tab.key)
+        if not cols:
+            # шапка зсунулась — version вже буде «бачена», тож явно ставимо вкладку на наступний цикл
+            watch_state.mark_pending(tab.key)
+            continue
+        fp = column_fingerprint(cols)
+        if fp != watch_state.fingerprints.get(tab.key) or watch_state.is_due(tab.key):
+            watch_state.fingerprints[tab.key] = fp
+            changed.append(tab)
+
+    rest = tuple(c for c in WATCH_COLUMNS if c not in FINGERPRINT_COLUMNS)
+    rest_cols = await fetch_watch_columns(sheets, changed, rest)
+
+    columns = {}
+    for tab in changed:
+        if tab.key in rest_cols:
+            columns[tab.key] = {**fingerprint_cols[tab.key], **rest_cols[tab.key]}
+        else:
+            # шапка зсунулась між двома читаннями — наступного циклу перечитаємо
+            watch_state.fingerprints.pop(tab.key, None)
+            watch_state.mark_pending(tab.key)
+    return columns
+
+# NotifiedAt пишемо не по клітинці, а однією values.batchUpdate на вкладку.
+# Якщо пачку відхилено як некоректну (400) — ділимо навпіл, щоб знайти погані
+# рядки; інші помилки (квота, 5xx) повертають усю пачку на повтор.
+async def flush_notified(sheets: AsyncSheets, tab: SheetTab, stamps: list[tuple[int, str]]) -> list[tuple[int, str]]:
+    letter = col_letter(tab.cols["NotifiedAt"])
+
+    async def write(chunk: list[tuple[int, str]]) -> list[tuple[int, str]]:
+        try:
+            await sheets.batch_update_values(SHEET_ID, [(a1(tab.title, f"{letter}{r_i}"), [[ts]]) for r_i, ts in chunk])
+            return []
+        except GoogleApiError as e:
+            if e.status != 400 or len(chunk) == 1:
+                print("notified write error:", tab.title, len(chunk), e.status, e.message[:200])
+                return chunk
+        mid = len(chunk) // 2
+        return await write(chunk[:mid]) + await write(chunk[mid:])
+
+    if not stamps:
+        return []
+    try:
+        return await write(stamps)
+    except Exception as e:
+        print("notified write error:", tab.title, len(stamps), type(e).__name__, str(e))
+        return stamps
+
+def status_text(status: str, shoot_date: str, shoot_time: str) -> str:
+    if status == "approved":
+        text = APPROVED_TEXT.format(shoot_date=shoot_date, shoot_time=shoot_time)
+        if shoot_date in LOCATION_DATES_MMDDYYYY:
+            text += APPROVED_LOCATION_10_11
+        return text
+    return REJECTED_TEXT
+
+def collect_notify_jobs(tab_key: tuple[str, str], cols: dict[str, list[str]], stamps: list[tuple[int, str, str]]) -> list[NotifyJob]:
+    n_rows = max(len(v) for v in cols.values())
+    jobs = []
+
+    def get_by_name(name: str, r_i: int) -> str:
+        col = cols.get(name, [])
+        return col[r_i - 1] if r_i - 1 < len(col) else ""
+
+    for r_i in range(2, n_rows + 1):  # 1-based row index
+        status = safe_lower(get_by_name("Status", r_i))
+        notified = (get_by_name("NotifiedAt", r_i) or "").strip()
+        chat_id = (get_by_name("TelegramChatId", r_i) or "").strip()
+        unstamped = watch_state.unstamped.pop((tab_key, r_i), None)
+
+        if not chat_id or notified or status not in {"approved", "rejected"}:
+            watch_state.retry.pop((tab_key, r_i), None)
+            continue
+
+        if unstamped and unstamped[0] == chat_id:
+            # вже надіслано минулого циклу — лише дописуємо NotifiedAt
+            stamps.append((r_i, unstamped[1], chat_id))
+            continue
+
+        if chat_id in chat_blocklist:
+            stamps.append((r_i, undeliverable_marker(chat_blocklist.chats[chat_id]), chat_id))
+            continue
+
+        retry = watch_state.retry.get((tab_key, r_i))
+        if retry and retry[0] == chat_id and retry[2] > time.monotonic():
+            watch_state.mark_pending(tab_key, retry[2])
+            continue
+
+        shoot_date = (get_by_name("ShootDate", r_i) or "").strip()
+        shoot_time = (get_by_name("ShootTime", r_i) or "").strip()
+        jobs.append(NotifyJob(tab_key, r_i, chat_id, status_text(status, shoot_date, shoot_time)))
+    return jobs
 
-                    ws.update_cell(r_i, notified_col, now_iso())
+async def status_watcher(bot: Bot):
+    run_in_background()
+    await asyncio.sleep(3)
+    # перший цикл — після прогріву: шапки вкладок дат уже в кеші
+    await tabs_ready.wait()
+    notifier = Notifier(bot)
 
+    while True:
+        try:
+            sheets = sheets_client()
+            # version беремо до сканування: зміни під час циклу побачимо наступного разу
+            version = await sheet_version()
+            columns = await changed_watch_columns(sheets, version)
+
+            stamps: dict[tuple[str, str], list[tuple[int, str, str]]] = {}
+            jobs: list[NotifyJob] = []
+            for tab_key, cols in columns.items():
+                watch_state.pending.pop(tab_key, None)
+                jobs += collect_notify_jobs(tab_key, cols, stamps.setdefault(tab_key, []))
+
+            try:
+                report = await notifier.send_all(jobs) if jobs else None
+            finally:
+                for job in jobs:
+                    if job.sent_at:
+                        watch_state.retry.pop((job.tab_key, job.r_i), None)
+                        stamps[job.tab_key].append((job.r_i, job.sent_at, job.chat_id))
+                    elif job.permanent:
+                        watch_state.retry.pop((job.tab_key, job.r_i), None)
+                        reason = type(job.error).__name__
+                        await chat_blocklist.add(job.chat_id, reason)
+                        stamps[job.tab_key].append((job.r_i, undeliverable_marker(reason), job.chat_id))
+                    else:
+                        watch_state.schedule_retry(job.tab_key, job.r_i, job.chat_id)
+
+                for tab_key, tab_stamps in stamps.items():
+                    tab = cached_tab(*tab_key)
+                    chats = {r_i: chat_id for r_i, _, chat_id in tab_stamps}
+                    failed = [(r_i, ts) for r_i, ts, _ in tab_stamps]
+                    if tab is not None:
+                        failed = await flush_notified(sheets, tab, failed)
+                    for r_i, ts in failed:
+                        watch_state.unstamped[(tab_key, r_i)] = (chats[r_i], ts)
+                        watch_state.mark_pending(tab_key)
+
+            if report:
+                print("status_watcher cycle:", json.dumps(report))
+            watch_state.version = version
         except Exception as e:
-            # щоб не валився процес у Railway
+            # щоб не валився процес у Railway; відбитки скидаємо, щоб наступний цикл перечитав усе
+            watch_state.fingerprints.clear()
             print("status_watcher error:", type(e).__name__, str(e))
 
         await asyncio.sleep(STATUS_CHECK_INTERVAL_SEC)
@@ -456,6 +2372,9 @@ async def on_begin(call: CallbackQuery, state: FSMContext):
 async def on_date(call: CallbackQuery, state: FSMContext):
     date_val = call.data.split(":", 1)[1]
     await state.update_data(shoot_date=date_val)
+    if date_val in DATES:
+        # поки людина обирає час і друкує імʼя, вкладка дати вже прогрівається
+        prefetch_tab(SHEET_ID, ddmmyyyy_to_mmddyyyy(date_val))
     await call.message.answer("Супер! ✨ Тепер оберіть зручний час ⏰", reply_markup=kb_times())
     await state.set_state(Form.shoot_time)
     await call.answer()
@@ -481,9 +2400,8 @@ async def on_model_name(message: Message, state: FSMContext):
     shoot_date_mmddyyyy = ddmmyyyy_to_mmddyyyy(data["shoot_date"])
 
     try:
-        gc = sheets_client()
-        ws = ensure_sheet_tab(gc, SHEET_ID, shoot_date_mmddyyyy)
-        if model_exists_in_tab(ws, text):
+        tab = await ensure_sheet_tab(SHEET_ID, shoot_date_mmddyyyy)
+        if await model_exists_in_tab(tab, text):
             await message.answer(
                 "Схоже, така людина вже подана на цю дату 🙂\n"
                 "Якщо це інша людина з таким самим ім’ям — додайте middle name або ініціал.\n\n"
@@ -601,16 +2519,22 @@ async def on_guardian_name(message: Message, state: FSMContext):
     await state.set_state(Form.photo)
 
 async def on_photo(message: Message, state: FSMContext, bot: Bot):
-    file_id = None
+    file_id = unique_id = None
     if message.photo:
-        file_id = message.photo[-1].file_id
+        photo = pick_photo_size(message.photo, PHOTO_MIN_LONG_EDGE)
+        file_id, unique_id = photo.file_id, photo.file_unique_id
     elif message.document and (message.document.mime_type or "").startswith("image/"):
-        file_id = message.document.file_id
+        file_id, unique_id = message.document.file_id, message.document.file_unique_id
 
     if not file_id:
         await message.answer("Це не схоже на фото 🙂 Надішліть, будь ласка, портретне фото.")
         return
 
+    problem = await check_photo(bot, message)
+    if problem:
+        await message.answer(problem)
+        return
+
     data = await state.get_data()
     required = ["shoot_date", "shoot_time", "model_name", "phone"]
     if missing_required(data, required):
@@ -619,20 +2543,12 @@ async def on_photo(message: Message, state: FSMContext, bot: Bot):
         return
 
     filename = normalize_filename(data["shoot_date"], data["shoot_time"], data["model_name"], data["phone"])
-    await message.answer("Дякую! 💛 Завантажую фото…")
-
-    try:
-        drive_url = await upload_photo_to_drive_service_account(bot, file_id, filename)
-    except Exception as e:
-        await message.answer(
-            "Не вдалося завантажити фото в Google Drive 😔\n"
-            "Спробуйте ще раз або напишіть адміну.\n\n"
-            f"Технічна помилка: {type(e).__name__}"
-        )
-        print("upload error:", type(e).__name__, str(e))
-        return
 
-    await state.update_data(photo_drive_url=drive_url)
+    # це фото вже в Drive — нічого не качаємо; інакше вантажиться у фоні, поки людина читає текст згоди
+    drive_url = upload_cache.get(unique_id)
+    folder = drive_folder_path(data["shoot_date"], data["shoot_time"])
+    job_id = None if drive_url else await photo_uploader.enqueue(file_id, filename, folder)
+    await state.update_data(photo_file_id=file_id, photo_filename=filename, photo_job_id=job_id, photo_drive_url=drive_url)
 
     await message.answer(
         "Майже готово ✅\n"
@@ -641,25 +2557,61 @@ async def on_photo(message: Message, state: FSMContext, bot: Bot):
     )
     await state.set_state(Form.consent)
 
+async def wait_photo_upload(call: CallbackQuery, data: dict) -> str:
+    job_id = data.get("photo_job_id")
+    if not photo_uploader.is_done(job_id):
+        await call.message.answer("Ще секунду — завантажую фото… ⏳")
+
+    drive_url = await photo_uploader.result(job_id, PHOTO_UPLOAD_WAIT_SEC)
+    if drive_url is None:
+        # задача загубилась (рестарт) — ставимо заново з того ж file_id
+        folder = drive_folder_path(data["shoot_date"], data["shoot_time"])
+        job_id = await photo_uploader.enqueue(data["photo_file_id"], data["photo_filename"], folder)
+        drive_url = await photo_uploader.result(job_id, PHOTO_UPLOAD_WAIT_SEC)
+    return drive_url
+
 async def on_consent(call: CallbackQuery, state: FSMContext):
     await call.answer()
     data = await state.get_data()
 
-    required = ["shoot_date", "shoot_time", "model_name", "dob", "phone", "email", "photo_drive_url"]
+    required = ["shoot_date", "shoot_time", "model_name", "dob", "phone", "email", "photo_file_id", "photo_filename"]
     if missing_required(data, required):
         await call.message.answer("Форма не активна 🙈 Почнемо спочатку: /start")
         await state.clear()
         return
 
+    if not data.get("photo_drive_url"):
+        try:
+            drive_url = await wait_photo_upload(call, data)
+        except Exception as e:
+            await call.message.answer(
+                "Не вдалося завантажити фото в Google Drive 😔\n"
+                "Надішліть, будь ласка, фото ще раз або напишіть адміну.\n\n"
+                f"Технічна помилка: {type(e).__name__}"
+            )
+            await state.set_state(Form.photo)
+            return
+        await state.update_data(photo_drive_url=drive_url)
+        data["photo_drive_url"] = drive_url
+
     shoot_date_mmddyyyy = ddmmyyyy_to_mmddyyyy(data["shoot_date"])
     guardian = (data.get("guardian_name") or "").strip()
     city_val = (data.get("city") or "").strip()
 
-    gc = sheets_client()
-    ws = ensure_sheet_tab(gc, SHEET_ID, shoot_date_mmddyyyy)
+    # дубль по імені: таблиця + журнал (там і ще не синхронізовані заявки)
+    duplicate = False
+    try:
+        tab = await ensure_sheet_tab(SHEET_ID, shoot_date_mmddyyyy)
+        duplicate = await model_exists_in_tab(tab, data["model_name"])
+    except Exception as e:
+        # Google недоступний — заявку все одно приймаємо в журнал
+        print("consent duplicate check error:", type(e).__name__, str(e))
+
+    # без await між перевіркою і journal.add, щоб паралельний дубль не проскочив
+    tab_key = (SHEET_ID, mmddyyyy_tab_name(shoot_date_mmddyyyy))
+    duplicate = duplicate or normalize_name_key(data["model_name"]) in submission_journal.pending_names(tab_key)
 
-    # дубль по імені
-    if model_exists_in_tab(ws, data["model_name"]):
+    if duplicate:
         await call.message.answer(
             "Схоже, ця людина вже є у списку на цю дату 🙂\n"
             "Якщо це інша людина з таким самим ім’ям — подайте ще раз з middle name/ініціалом.\n\n"
@@ -696,7 +2648,9 @@ async def on_consent(call: CallbackQuery, state: FSMContext):
         "SubmittedAt": submitted_at,
     }
 
-    append_row_by_header(ws, row_dict)
+    # підтверджуємо одразу після коміту в журнал; у таблицю запише journal_sync_worker
+    await submission_journal.add(SHEET_ID, shoot_date_mmddyyyy, row_dict)
+    await chat_blocklist.discard(str(call.from_user.id))
 
     await call.message.answer(UA_FINISH, reply_markup=kb_more())
     await state.clear()
@@ -714,6 +2668,289 @@ async def on_more(call: CallbackQuery, state: FSMContext):
         await call.message.answer("Готово 💛 Гарного дня! Якщо що — просто напишіть /start")
 
 
+# =====================
+# FSM STORAGE
+# =====================
+def fsm_key(key: StorageKey) -> str:
+    return ":".join(str(p) if p is not None else "" for p in (
+        key.bot_id,
+        key.chat_id,
+        key.user_id,
+        key.thread_id,
+        getattr(key, "business_connection_id", None),
+        key.destiny,
+    ))
+
+def fsm_state_name(state) -> str | None:
+    return state.state if isinstance(state, State) else state
+
+def parse_state_ttls(raw: str) -> dict[str, int]:
+    ttls = dict(FSM_STATE_TTL_DEFAULTS)
+    for part in (raw or "").split(","):
+        if "=" in part:
+            name, sec = part.rsplit("=", 1)
+            ttls[name.strip()] = int(sec)
+    return ttls
+
+# FSM у локальній SQLite: читання з памʼяті, записи накопичуються і раз на
+# FSM_FLUSH_MS йдуть у базу однією транзакцією. Серіалізація — компактний JSON.
+# Кожна сесія живе TTL свого стану від останньої зміни; у памʼяті тримаємо не
+# більше max_sessions (LRU), решта лишається лише в базі.
+class SQLiteStorage(BaseStorage):
+    def __init__(self, ttl_sec: int, flush_ms: int, state_ttls: dict[str, int], max_sessions: int):
+        self.ttl_sec = ttl_sec
+        self.flush_sec = flush_ms / 1000
+        self.state_ttls = state_ttls
+        self.max_sessions = max(max_sessions, 1)
+        self._cache: OrderedDict[str, list] = OrderedDict()  # key -> [state, data, updated_at]
+        self._dirty: set[str] = set()
+        self._spilled: dict[str, list] = {}  # витіснені з памʼяті, але ще не записані
+        self._flusher: asyncio.Task | None = None
+        self.evicted = 0
+        self.expired = 0
+
+    def ttl_for(self, state: str | None) -> int:
+        if state is None:
+            return self.ttl_sec
+        return self.state_ttls.get(state, FSM_IDLE_TTL_SEC)
+
+    def _init(self):
+        db = local_db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            " key TEXT PRIMARY KEY, state TEXT, data TEXT, updated_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS fsm_expires ON fsm(expires_at)")
+        db.execute("DELETE FROM fsm WHERE expires_at < ?", (time.time(),))
+
+    def _load(self, key: str) -> tuple | None:
+        return local_db().execute(
+            "SELECT state, data, updated_at FROM fsm WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+
+    def _write(self, rows: list[tuple], deleted: list[str]):
+        db = local_db()
+        with db:
+            if rows:
+                db.executemany(
+                    "INSERT OR REPLACE INTO fsm (key, state, data, updated_at, expires_at) VALUES (?, ?, ?, ?, ?)", rows
+                )
+            if deleted:
+                db.executemany("DELETE FROM fsm WHERE key = ?", [(k,) for k in deleted])
+
+    def _purge(self) -> int:
+        with local_db() as db:
+            return db.execute("DELETE FROM fsm WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def _state_counts(self) -> dict:
+        rows = local_db().execute(
+            "SELECT COALESCE(state, ''), COUNT(*) FROM fsm WHERE expires_at >= ? GROUP BY state", (time.time(),)
+        ).fetchall()
+        return {state or "-": n for state, n in rows}
+
+    async def open(self):
+        await local_db_pool.run(self._init)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def _expired(self, entry: list, now: float) -> bool:
+        return now - entry[2] > self.ttl_for(entry[0])
+
+    async def _entry(self, key: StorageKey) -> list:
+        k = fsm_key(key)
+        entry = self._cache.get(k)
+        if entry is None:
+            entry = self._spilled.get(k)
+            if entry is None:
+                row = await local_db_pool.run(self._load, k)
+                entry = [row[0], json.loads(row[1] or "{}"), row[2]] if row else [None, {}, time.time()]
+            entry = self._cache.setdefault(k, entry)
+            self._evict_overflow()
+        else:
+            self._cache.move_to_end(k)
+        if self._expired(entry, time.time()):
+            entry[:] = [None, {}, time.time()]
+        return entry
+
+    def _evict_overflow(self):
+        while len(self._cache) > self.max_sessions:
+            k, entry = self._cache.popitem(last=False)
+            if k in self._dirty:
+                self._spilled[k] = entry
+            self.evicted += 1
+
+    def _touch(self, key: StorageKey, entry: list):
+        entry[2] = time.time()
+        self._dirty.add(fsm_key(key))
+
+    async def set_state(self, key: StorageKey, state=None) -> None:
+        entry = await self._entry(key)
+        entry[0] = fsm_state_name(state)
+        self._touch(key, entry)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._entry(key))[0]
+
+    async def set_data(self, key: StorageKey, data) -> None:
+        entry = await self._entry(key)
+        entry[1] = dict(data)
+        self._touch(key, entry)
+
+    async def get_data(self, key: StorageKey) -> dict:
+        return dict((await self._entry(key))[1])
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        spilled, self._spilled = self._spilled, {}
+        rows, deleted = [], []
+        for k in dirty:
+            entry = self._cache.get(k) or spilled.get(k)
+            if entry is None or (entry[0] is None and not entry[1]):
+                # порожній стан нічого не важить — прибираємо і з памʼяті, і з бази
+                self._cache.pop(k, None)
+                deleted.append(k)
+                continue
+            data = json.dumps(entry[1], ensure_ascii=False, separators=(",", ":"))
+            rows.append((k, entry[0], data, entry[2], entry[2] + self.ttl_for(entry[0])))
+        try:
+            await local_db_pool.run(self._write, rows, deleted)
+        except Exception:
+            self._dirty |= dirty
+            self._spilled = {**spilled, **self._spilled}
+            raise
+
+    async def sweep(self):
+        # прострочені сесії: з памʼяті одразу, з бази — одним DELETE по expires_at
+        now = time.time()
+        for k in [k for k, entry in self._cache.items() if self._expired(entry, now)]:
+            self._cache.pop(k, None)
+            self._dirty.discard(k)
+            self._spilled.pop(k, None)
+            self.expired += 1
+        self.expired += await local_db_pool.run(self._purge)
+
+    async def stats(self) -> dict:
+        return {
+            "cached": len(self._cache),
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "by_state": await local_db_pool.run(self._state_counts),
+        }
+
+    async def _flush_loop(self):
+        last_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_sec)
+            try:
+                await self.flush()
+                if time.monotonic() - last_sweep >= FSM_SWEEP_INTERVAL_SEC:
+                    last_sweep = time.monotonic()
+                    await self.sweep()
+            except Exception as e:
+                print("fsm flush error:", type(e).__name__, str(e))
+
+    async def close(self) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+        await self.flush()
+
+async def build_fsm_storage() -> BaseStorage:
+    if FSM_STORAGE == "memory":
+        return MemoryStorage()
+    if FSM_STORAGE == "redis":
+        if not FSM_REDIS_URL:
+            raise RuntimeError("FSM_REDIS_URL is empty in Railway Variables")
+        # будь-який Redis-сумісний сервер (Redis, KeyDB, Valkey, локальний для тестів)
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(FSM_REDIS_URL, state_ttl=FSM_TTL_SEC, data_ttl=FSM_TTL_SEC)
+    if FSM_STORAGE != "sqlite":
+        raise RuntimeError(f"FSM_STORAGE must be memory, sqlite or redis, got {FSM_STORAGE!r}")
+    storage = SQLiteStorage(FSM_TTL_SEC, FSM_FLUSH_MS, parse_state_ttls(FSM_STATE_TTLS), FSM_MAX_SESSIONS)
+    await storage.open()
+    return storage
+
+
+# =====================
+# WEBHOOK
+# =====================
+# Апдейти приходять POST-ом від Telegram. Обробляємо у фоні, але не більше
+# WEBHOOK_MAX_CONCURRENCY одночасно: коли всі слоти зайняті, запит чекає —
+# Telegram сам притримає наступні (backpressure замість черги в памʼяті).
+class WebhookServer:
+    def __init__(self, dp: Dispatcher, bot: Bot, secret: str, max_concurrency: int):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self._slots = asyncio.Semaphore(max(max_concurrency, 1))
+        self._tasks: set[asyncio.Task] = set()
+        self.accepting = True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.secret:
+            return web.Response(status=401)
+        if not self.accepting:
+            # Telegram повторить апдейт — його отримає інша репліка або наступний запуск
+            return web.Response(status=503)
+
+        update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            print("webhook update error:", type(e).__name__, str(e))
+        finally:
+            self._slots.release()
+
+    async def drain(self, timeout: float):
+        self.accepting = False
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL is empty in Railway Variables")
+    if not WEBHOOK_SECRET:
+        # без секрету будь-хто може надіслати на вебхук підроблений апдейт
+        raise RuntimeError("WEBHOOK_SECRET is empty in Railway Variables")
+
+    server = WebhookServer(dp, bot, WEBHOOK_SECRET, WEBHOOK_MAX_CONCURRENCY)
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await dp.emit_startup(bot=bot)
+    await bot.set_webhook(
+        WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=min(max(WEBHOOK_MAX_CONCURRENCY, 1), 100),
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    print("webhook listening on", f"{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    try:
+        await stop.wait()
+    finally:
+        # вебхук не видаляємо: за балансувальником можуть працювати інші репліки
+        await server.drain(WEBHOOK_DRAIN_SEC)
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+
+
 # =====================
 # MAIN
 # =====================
@@ -727,8 +2964,16 @@ async def main():
     if not SERVICE_ACCOUNT_JSON_B64:
         raise RuntimeError("SERVICE_ACCOUNT_JSON_B64 is empty in Railway Variables")
 
+    # клієнти Google створюємо один раз, до першого апдейту
+    init_google_clients()
+    await submission_journal.open()
+    await chat_blocklist.open()
+    await upload_cache.open()
+    await drive_folders.open()
+
     bot = Bot(BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    storage = await build_fsm_storage()
+    dp = Dispatcher(storage=storage)
 
     dp.message.register(cmd_start, CommandStart())
     dp.callback_query.register(on_begin, F.data == "begin:yes")
@@ -753,9 +2998,27 @@ async def main():
 
     dp.callback_query.register(on_more, F.data.startswith("more:"))
 
-    asyncio.create_task(status_watcher(bot))
+    # прогрів іде паралельно зі стартом polling/webhook — перші апдейти не чекають
+    asyncio.create_task(warm_all_tabs())
+    if STATUS_WATCHER_ENABLED:
+        asyncio.create_task(status_watcher(bot))
+    photo_uploader.start(bot)
+    asyncio.create_task(submission_writer.run())
+    asyncio.create_task(journal_sync_worker())
+    asyncio.create_task(metrics_reporter(storage))
 
-    await dp.start_polling(bot)
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await storage.close()
+        await sheets_client().close()
+        await drive_uploads().close()
+        sheets_pool.shutdown()
+        drive_pool.shutdown()
+        shutdown_photo_processes()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file